@@ -0,0 +1,208 @@
+import os
+import json
+import argparse
+from collections import Counter
+from difflib import SequenceMatcher
+
+import numpy as np
+from scipy import sparse
+
+# Character alias resolution: finds cue names that are probably typos of
+# another character (KRABAPPLE / KRABAPPEL, SISDESHOW BOB / SIDESHOW BOB) and
+# keeps accepted merges in a mapping file, data/character_aliases.json:
+#
+#   {"KRABAPPLE": "KRABAPPEL", "COTZ": "BOTZ", "MOE": "MOE"}
+#
+# A name mapped to itself is a known distinct character and is never proposed
+# as a variant again. extract.py --aliases applies the mapping.
+#
+# Only names sharing a character trigram are compared: names are indexed by
+# their trigrams (a sparse names x trigrams matrix), the trigrams they share
+# are counted with one sparse product per chunk of names, and only the pairs
+# that can still reach the similarity threshold are scored with difflib. The
+# work grows with the number of near neighbours rather than with the square
+# of the number of names.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+ALIASES_FILE = "character_aliases.json"
+
+# Default minimum difflib similarity ratio for proposing a merge
+MIN_SIMILARITY = 0.85
+
+# Trigrams shared by more names than this don't form blocks: they are too
+# common ("ER ", " MR") to say much about two names, and their blocks would
+# make up most of the pairs to check
+MAX_BLOCK_SIZE = 200
+
+# Names whose candidate pairs are counted in one sparse product
+CHUNK_SIZE = 2000
+
+
+def trigrams(name):
+    padded = f" {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def blocking_matrix(names, max_block_size=MAX_BLOCK_SIZE):
+    """Sparse names x trigrams 0/1 matrix, without the trigrams of blocks
+    larger than `max_block_size`."""
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    for name in names:
+        indices.extend(vocabulary.setdefault(gram, len(vocabulary)) for gram in trigrams(name))
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.int32), indices, indptr), shape=(len(names), len(vocabulary))
+    )
+    block_sizes = np.bincount(matrix.indices, minlength=len(vocabulary))
+    return matrix[:, np.flatnonzero(block_sizes <= max_block_size)].tocsr()
+
+
+def character_counts(names):
+    """names x characters matrix of how often each character occurs."""
+    characters = {}
+    rows, codes = [], []
+    for row, name in enumerate(names):
+        rows.extend([row] * len(name))
+        codes.extend(characters.setdefault(ch, len(characters)) for ch in name)
+    counts = np.zeros((len(names), len(characters)), dtype=np.int16)
+    np.add.at(counts, (rows, codes), 1)
+    return counts
+
+
+def candidate_pairs(names, min_similarity=MIN_SIMILARITY, max_block_size=MAX_BLOCK_SIZE,
+                    chunk_size=CHUNK_SIZE):
+    """Yields the (i, j) index pairs, i < j, of the names that share a
+    trigram block and pass cheap upper bounds of the similarity ratio.
+
+    The bounds never reject a pair that reaches `min_similarity`: the ratio
+    is 2 * matched / (both lengths), so the shorter length, the characters in
+    common and the shared trigrams all cap it. Each character left unmatched
+    in either name breaks at most 3 trigrams.
+    """
+    matrix = blocking_matrix(names, max_block_size)
+    transposed = matrix.T.tocsr()
+    indexed = np.diff(matrix.indptr)
+    lengths = np.array([len(name) for name in names])
+    characters = character_counts(names)
+
+    for start in range(0, len(names), chunk_size):
+        shared = (matrix[start:start + chunk_size] @ transposed).tocoo()
+        i, j = shared.row + start, shared.col
+        total = lengths[i] + lengths[j]
+        unmatched = np.floor((1 - min_similarity) * total + 1e-9)
+        keep = ((i < j)
+                & (2 * np.minimum(lengths[i], lengths[j]) >= min_similarity * total)
+                & (shared.data >= indexed[i] - 3 * unmatched))
+        i, j = i[keep], j[keep]
+        common = np.minimum(characters[i], characters[j]).sum(axis=1)
+        keep = 2 * common >= min_similarity * (lengths[i] + lengths[j])
+        i, j = i[keep], j[keep]
+        order = np.lexsort((j, i))
+        yield from zip(i[order].tolist(), j[order].tolist())
+
+
+def similarity(a, b):
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def propose_merges(counts, aliases=None, min_similarity=MIN_SIMILARITY, keep=(),
+                   max_block_size=MAX_BLOCK_SIZE):
+    """Proposed (variant, canonical, similarity) merges between cue names.
+
+    `counts` maps every distinct cue name to its number of dialogue blocks;
+    of two similar names, the rarer one is the variant. Names already in
+    `aliases` (the mapping file) or in `keep` are never proposed as variants,
+    and equally frequent names are left alone. Each variant gets its most
+    similar canonical name; proposals are sorted by similarity.
+    """
+    aliases = aliases or {}
+    names = sorted(name for name in counts if aliases.get(name, name) == name)
+    fixed = set(aliases) | set(keep)
+    best = {}
+    for i, j in candidate_pairs(names, min_similarity, max_block_size):
+        a, b = names[i], names[j]
+        if counts[a] == counts[b]:
+            continue
+        variant, canonical = (a, b) if counts[a] < counts[b] else (b, a)
+        if variant in fixed:
+            continue
+        score = similarity(a, b)
+        if score >= min_similarity and score > best.get(variant, (None, 0.0))[1]:
+            best[variant] = (canonical, score)
+    return sorted(
+        ((variant, canonical, score) for variant, (canonical, score) in best.items()),
+        key=lambda m: (-m[2], m[0])
+    )
+
+
+def load_aliases(path):
+    """The variant -> canonical mapping saved at `path`, or {} if missing."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_aliases(path, aliases):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(aliases.items())), f, indent=1)
+
+
+def resolve_alias(aliases, name):
+    """Follows `name` through the mapping to its final canonical name."""
+    seen = {name}
+    while aliases.get(name, name) != name:
+        name = aliases[name]
+        if name in seen:  # a cycle in a hand-edited file; stop where it closes
+            break
+        seen.add(name)
+    return name
+
+
+def cue_counts(workers=1):
+    """Dialogue blocks per normalized cue name over the formatted scripts,
+    before the minimum-count filter. Uses (and refreshes) extract.py's cache."""
+    from extract import SCRIPTS_FOLDER, iter_script_results, list_script_files
+
+    counts = Counter()
+    for _, (_, file_stats, _) in iter_script_results(list_script_files(SCRIPTS_FOLDER), workers):
+        counts.update(file_stats)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Propose and save merges of misspelled character names.")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="folder holding formatted_scripts and the alias mapping (default: %(default)s)")
+    parser.add_argument("--aliases", help=f"alias mapping file (default: DATA_DIR/{ALIASES_FILE})")
+    parser.add_argument("--min-similarity", type=float, default=MIN_SIMILARITY,
+                        help="minimum similarity ratio of a merge, 0 to 1 (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=1, help="processes used to parse changed scripts")
+    parser.add_argument("--accept", action="store_true", help="add every proposed merge to the mapping file")
+    args = parser.parse_args(argv)
+
+    import extract
+
+    extract.set_data_dir(args.data_dir)
+    aliases_path = args.aliases or os.path.join(args.data_dir, ALIASES_FILE)
+    aliases = load_aliases(aliases_path)
+    counts = cue_counts(args.workers)
+    # The hand-maintained mapping's canonical names are known characters
+    keep = set(extract.CHARACTER_MAPPING.values())
+    merges = propose_merges(counts, aliases, args.min_similarity, keep)
+
+    print(f"{len(counts)} distinct names, {len(aliases)} in {aliases_path}, {len(merges)} proposed merges")
+    for variant, canonical, score in merges:
+        print(f"  {score:.2f}  {variant} ({counts[variant]}) -> {canonical} ({counts[canonical]})")
+
+    if args.accept and merges:
+        aliases.update((variant, canonical) for variant, canonical, _ in merges)
+        save_aliases(aliases_path, aliases)
+        print(f"Saved {len(merges)} merges to {aliases_path}")
+
+
+if __name__ == "__main__":
+    main()
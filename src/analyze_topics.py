@@ -1,8 +1,12 @@
-import pandas as pd
-import glob
+import numpy as np
+import argparse
 import os
-import re
-from sklearn.feature_extraction.text import TfidfVectorizer, ENGLISH_STOP_WORDS
+import string
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, ENGLISH_STOP_WORDS
+
+import tfidf_cache
+from annotated_data import DATA_DIR, annotated_files, load_data
 
 # Mapping of Annotation ID to Topic Name (based on chat history)
 TOPIC_MAPPING = {
@@ -16,104 +20,280 @@ TOPIC_MAPPING = {
     8: "Non-physical - Opinion/Judgement"
 }
 
-def load_data(data_dir="Data"):
-    """Loads and combines annotated CSV files."""
-    all_files = glob.glob(os.path.join(data_dir, "*_annotated_dialogue.csv"))
-    df_list = []
-    for filename in all_files:
-        read_success = False
-        for encoding in ['utf-8', 'cp1252', 'latin1']:
-            try:
-                df = pd.read_csv(filename, encoding=encoding)
-                df_list.append(df)
-                read_success = True
-                break
-            except UnicodeDecodeError:
-                continue
-            except Exception as e:
-                print(f"Error reading {filename} with {encoding}: {e}")
-        
-        if not read_success:
-            print(f"Failed to read {filename} with any supported encoding.")
+# Vectorizer settings; part of the TF-IDF cache key
+TFIDF_PARAMS = {"stop_words": "english", "max_features": 1000}
+
+class _CleanTable(dict):
+    """str.translate table for preprocess_text: keeps ASCII letters (as
+    lowercase) and whitespace, deletes everything else. Entries are filled
+    in on first use, so it covers any Unicode character."""
     
-    if not df_list:
-        raise ValueError("No CSV files found!")
-        
-    combined_df = pd.concat(df_list, ignore_index=True)
-    return combined_df
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        if char in string.ascii_letters:
+            value = ord(char.lower())
+        elif char.isspace():  # same set as \s in a str regex
+            value = codepoint
+        else:
+            value = None
+        self[codepoint] = value
+        return value
+
+CLEAN_TABLE = _CleanTable()
 
 def preprocess_text(text):
     """Basic text cleaning."""
     if not isinstance(text, str):
         return ""
-    # Remove non-alphabetic characters (keep spaces)
-    text = re.sub(r'[^a-zA-Z\s]', '', text)
-    # Lowercase
-    text = text.lower()
-    return text
+    # Remove non-alphabetic characters (keep spaces) and lowercase, in one pass
+    return text.translate(CLEAN_TABLE)
 
-def compute_tfidf_top_words(df):
-    """Computes TF-IDF and returns top 10 words per topic."""
+def clean_text_column(texts, tokens=False):
+    """preprocess_text over a whole column at once.
+
+    Works on any Series of dialogue, e.g. the full simpsons_dialogue_cleaned.csv,
+    not just the annotated lines. With tokens=True, returns token lists
+    instead of strings, ready for CountVectorizer(analyzer=token_analyzer()).
+    """
+    # Non-strings come back as NaN from .str, and preprocess_text maps them to ""
+    clean = texts.str.translate(CLEAN_TABLE).fillna("")
+    if tokens:
+        return clean.str.split()
+    return clean
+
+def token_analyzer(stop_words=ENGLISH_STOP_WORDS):
+    """CountVectorizer analyzer for pre-split, cleaned tokens.
+
+    Cleaned text only holds letters and whitespace, so whitespace splitting
+    plus the length filter gives exactly the tokens of the default
+    token_pattern (two or more word characters).
+    """
+    def analyze(tokens):
+        return [token for token in tokens if len(token) > 1 and token not in stop_words]
+    return analyze
+
+def top_k_per_row(matrix, k=10):
+    """Returns the k highest (column, value) pairs of every row of a sparse matrix.
+
+    Works on the CSR data/indices arrays directly, partitioning each row
+    segment, so no row is ever densified. Equal values are ordered by column
+    index (alphabetically, for vectorizer features). Rows with fewer than k
+    non-zeros are padded with zero-valued columns, as a dense argsort would be.
+    """
+    matrix = matrix.tocsr()
+    data, indices, indptr = matrix.data, matrix.indices, matrix.indptr
+    n_cols = matrix.shape[1]
+    results = []
     
-    # Group by annotation (topic)
-    # We treat all dialogue in a topic as one big document
-    topic_docs = df.groupby('annotation')['dialogue'].apply(lambda x: ' '.join(x.astype(str))).reset_index()
+    for row in range(matrix.shape[0]):
+        values = data[indptr[row]:indptr[row + 1]]
+        columns = indices[indptr[row]:indptr[row + 1]]
+        
+        # Keep everything tied with the k-th largest value, then sort
+        if len(values) > k:
+            kth_value = np.partition(values, len(values) - k)[len(values) - k]
+            candidates = np.flatnonzero(values >= kth_value)
+        else:
+            candidates = np.arange(len(values))
+        order = candidates[np.lexsort((columns[candidates], -values[candidates]))][:k]
+        top = [(int(columns[i]), values[i]) for i in order]
+        
+        # Pad with zero-scored columns, like argsort over the dense row would
+        if len(top) < k:
+            present = set(columns.tolist())
+            for col in range(n_cols):
+                if len(top) >= k:
+                    break
+                if col not in present:
+                    top.append((col, data.dtype.type(0)))
+        results.append(top)
+        
+    return results
+
+def build_line_terms(df, max_features=1000):
+    """Tokenizes every dialogue line once.
+
+    Returns a (lines x terms) sparse count matrix and the feature names. The
+    vocabulary is the one TfidfVectorizer(stop_words='english',
+    max_features=...) would pick over any grouping of these lines: joining
+    lines into group documents doesn't change the corpus-wide term totals
+    that max_features ranks by.
+    """
+    tokens = clean_text_column(df['dialogue'].astype(str), tokens=True)
+    vectorizer = CountVectorizer(analyzer=token_analyzer())
+    counts = vectorizer.fit_transform(tokens)
+    feature_names = vectorizer.get_feature_names_out()
     
-    # Preprocess
-    topic_docs['clean_text'] = topic_docs['dialogue'].apply(preprocess_text)
+    if max_features is not None and counts.shape[1] > max_features:
+        # Same ranking as sklearn's own max_features cut, on the same totals
+        totals = np.asarray(counts.sum(axis=0)).ravel()
+        keep = np.sort((-totals).argsort()[:max_features])
+        counts = counts[:, keep]
+        feature_names = feature_names[keep]
     
-    # TF-IDF Vectorization
-    # Use standard english stop words, plus maybe some common conversational fillers if needed
-    # For now, standard list is a good start.
-    vectorizer = TfidfVectorizer(stop_words='english', max_features=1000)
-    tfidf_matrix = vectorizer.fit_transform(topic_docs['clean_text'])
-    feature_names = vectorizer.get_feature_names_out()
+    return counts.tocsr(), feature_names
+
+def group_indicator(df, by):
+    """Sparse (groups x lines) 0/1 matrix for grouping `df` by the column(s) in `by`.
+
+    Groups come in sorted order, like DataFrame.groupby; lines with a missing
+    key belong to no group. Returns (indicator, group labels).
+    """
+    # observed=True: categorical keys only get groups for values that occur
+    grouped = df.groupby(by, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    labels = list(grouped.size().index)
     
-    results = {}
+    lines = np.flatnonzero(codes >= 0)
+    indicator = sp.csr_matrix(
+        (np.ones(len(lines), dtype=np.int64), (codes[lines], lines)),
+        shape=(len(labels), len(df))
+    )
+    return indicator, labels
+
+def grouped_tfidf(df, by, line_terms=None):
+    """TF-IDF over one document per group of `df`, grouped by any column(s).
+
+    Group term counts are summed from the line term matrix (indicator x
+    line terms) instead of re-tokenizing concatenated text, so one
+    build_line_terms() pass can serve topic, character and episode reports.
+    Returns (group labels, tfidf matrix, feature names, idf vector).
+    """
+    if line_terms is None:
+        line_terms = build_line_terms(df)
+    counts, feature_names = line_terms
     
-    for idx, row in topic_docs.iterrows():
-        topic_id = row['annotation']
-        
-        # Get the row from the TF-IDF matrix corresponding to this topic
-        # Note: idx in iterrows might not match matrix index if topics are missing, 
-        # but here we reset_index so it should match the order in topic_docs
-        tfidf_scores = tfidf_matrix[idx].toarray().flatten()
-        
-        # Get top 10 indices
-        top_indices = tfidf_scores.argsort()[-10:][::-1]
-        
-        top_words = [(feature_names[i], tfidf_scores[i]) for i in top_indices]
-        results[topic_id] = top_words
+    indicator, labels = group_indicator(df, by)
+    group_counts = indicator @ counts
+    
+    transformer = TfidfTransformer()
+    tfidf_matrix = transformer.fit_transform(group_counts)
+    return labels, tfidf_matrix, feature_names, transformer.idf_
+
+def top_words_by_group(df, by, line_terms=None, k=10):
+    """Returns the top k TF-IDF words of every group of `df`."""
+    labels, tfidf_matrix, feature_names, _ = grouped_tfidf(df, by, line_terms)
+    return top_words_from_matrix(labels, tfidf_matrix, feature_names, k)
+
+def top_words_from_matrix(labels, tfidf_matrix, feature_names, k=10):
+    results = {}
+    for label, top in zip(labels, top_k_per_row(tfidf_matrix, k)):
+        results[label] = [(feature_names[i], score) for i, score in top]
         
     return results
 
-def main():
-    try:
-        df = load_data()
-        print(f"Loaded {len(df)} lines of dialogue.")
-    except Exception as e:
-        print(f"Failed to load data: {e}")
-        return
-
-    print("\nComputing TF-IDF...")
-    try:
-        top_words_by_topic = compute_tfidf_top_words(df)
-    except Exception as e:
-        print(f"Analysis failed: {e}")
-        return
-
-    print("\nTop 10 Words per Topic:")
+def compute_tfidf_top_words(df):
+    """Computes TF-IDF and returns top 10 words per topic."""
+    
+    # Group by annotation (topic)
+    # We treat all dialogue in a topic as one big document
+    return top_words_by_group(df, 'annotation')
+
+def cached_top_words(data_dir, groupings, cache_dir, max_bytes, k=10):
+    """Top words for each grouping, reusing the on-disk TF-IDF cache.
+
+    The cache entry is keyed on the annotated files' content hashes and
+    TFIDF_PARAMS. If it already holds a grouping, nothing is loaded or
+    tokenized; otherwise the data is loaded once and the line term matrix is
+    read from (or added to) the entry.
+    """
+    paths = annotated_files(data_dir)
+    if not paths:
+        raise ValueError("No CSV files found!")
+    key = tfidf_cache.cache_key(paths, TFIDF_PARAMS)
+    entry = tfidf_cache.entry_path(cache_dir, key)
+    
+    df = None
+    line_terms = None
+    reports = []
+    for by in groupings:
+        cached = tfidf_cache.load_grouping(entry, by)
+        if cached is None:
+            if df is None:
+                df = load_data(data_dir)
+                print(f"Loaded {len(df)} lines of dialogue.")
+                line_terms = tfidf_cache.load_line_terms(entry)
+                if line_terms is None:
+                    line_terms = build_line_terms(df, TFIDF_PARAMS["max_features"])
+                    tfidf_cache.save_line_terms(entry, line_terms, TFIDF_PARAMS, paths)
+            labels, tfidf_matrix, _, idf = grouped_tfidf(df, by, line_terms)
+            tfidf_cache.save_grouping(entry, by, labels, tfidf_matrix, idf)
+            feature_names = line_terms[1]
+        else:
+            labels, tfidf_matrix, _ = cached
+            print(f"Using cached TF-IDF for {tfidf_cache.grouping_name(by)} ({key})")
+            if line_terms is None:
+                line_terms = tfidf_cache.load_line_terms(entry)
+            feature_names = line_terms[1]
+        reports.append((by, top_words_from_matrix(labels, tfidf_matrix, feature_names, k)))
+    
+    tfidf_cache.touch(entry)
+    tfidf_cache.evict(cache_dir, max_bytes, keep=key)
+    return reports
+
+def print_top_words(top_words, title):
+    print(f"\nTop 10 Words per {title}:")
     print("=" * 60)
     
-    # Sort by topic ID for cleaner output
-    for topic_id in sorted(top_words_by_topic.keys()):
-        topic_name = TOPIC_MAPPING.get(topic_id, f"Topic {topic_id}")
-        words = top_words_by_topic[topic_id]
+    # Sort by group for cleaner output
+    for label in sorted(top_words.keys()):
+        if title == "Topic":
+            header = f"[{label}] {TOPIC_MAPPING.get(label, f'Topic {label}')}"
+        elif isinstance(label, tuple):
+            header = " / ".join(str(part) for part in label)
+        else:
+            header = str(label)
         
-        print(f"\n[{topic_id}] {topic_name}")
+        print(f"\n{header}")
         print("-" * 30)
-        for word, score in words:
+        for word, score in top_words[label]:
             print(f"  {word:<15} ({score:.4f})")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Top TF-IDF words per topic (or any other grouping).")
+    parser.add_argument("--by", nargs="+", action="append", metavar="COLUMN",
+                        help="group by these columns instead of annotation; repeat for several reports")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always recompute, without reading or writing the TF-IDF cache")
+    parser.add_argument("--cache-size", type=float, default=256,
+                        help="size limit of the TF-IDF cache in MB (default: 256)")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="folder holding the *_annotated_dialogue.csv files (default: %(default)s)")
+    args = parser.parse_args(argv)
+    groupings = [by[0] if len(by) == 1 else by for by in (args.by or [["annotation"]])]
+    data_dir = args.data_dir
+
+    if not args.no_cache:
+        print("\nComputing TF-IDF...")
+        try:
+            reports = cached_top_words(data_dir, groupings, os.path.join(data_dir, "tfidf_cache"),
+                                       int(args.cache_size * 1024 * 1024))
+        except Exception as e:
+            print(f"Analysis failed: {e}")
+            return
+    else:
+        try:
+            df = load_data(data_dir)
+            print(f"Loaded {len(df)} lines of dialogue.")
+        except Exception as e:
+            print(f"Failed to load data: {e}")
+            return
+
+        print("\nComputing TF-IDF...")
+        try:
+            # One tokenization pass shared by every report
+            line_terms = build_line_terms(df, TFIDF_PARAMS["max_features"])
+            reports = [(by, top_words_by_group(df, by, line_terms)) for by in groupings]
+        except Exception as e:
+            print(f"Analysis failed: {e}")
+            return
+
+    for by, top_words in reports:
+        if by == "annotation":
+            title = "Topic"
+        else:
+            title = " x ".join(col.capitalize() for col in ([by] if isinstance(by, str) else by))
+        print_top_words(top_words, title)
+
 if __name__ == "__main__":
     main()
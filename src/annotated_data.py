@@ -0,0 +1,88 @@
+import os
+import io
+import glob
+import codecs
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Loader for the hand-annotated *_annotated_dialogue.csv files, shared by
+# analyze_topics.py and generate_chart.py. Kept apart from analyze_topics so
+# charting doesn't have to import scikit-learn.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+def annotated_files(data_dir=DATA_DIR):
+    return sorted(glob.glob(os.path.join(data_dir, "*_annotated_dialogue.csv")))
+
+def decode_csv_bytes(data):
+    """Decodes a CSV's bytes, trying the same encodings in the same order the
+    old per-encoding read_csv retries did. Returns (text, encoding).
+
+    Only the bytes are re-decoded on a miss, never re-parsed: a file that
+    isn't utf-8 fails on its first stray byte, and pure-ASCII files (most of
+    them) are accepted without trying anything else.
+    """
+    if data.startswith(codecs.BOM_UTF8):
+        return data[len(codecs.BOM_UTF8):].decode("utf-8"), "utf-8"
+    if data.isascii():
+        return data.decode("ascii"), "utf-8"
+    for encoding in ("utf-8", "cp1252"):
+        try:
+            return data.decode(encoding), encoding
+        except UnicodeDecodeError:
+            continue
+    return data.decode("latin1"), "latin1"
+
+def read_annotated_file(path):
+    """Reads one annotated CSV, parsing it exactly once. Returns (df, encoding)."""
+    with open(path, "rb") as f:
+        text, encoding = decode_csv_bytes(f.read())
+    return pd.read_csv(io.StringIO(text)), encoding
+
+def load_data(data_dir=DATA_DIR, workers=4):
+    """Loads and combines annotated CSV files.
+
+    Files are read concurrently in a thread pool (decoding and parsing
+    release the GIL for most of their time). character/episode come back as
+    categoricals and annotation as integers (lines without one are dropped);
+    df.attrs["encodings"] maps each file name to the encoding it was read with.
+    """
+    all_files = annotated_files(data_dir)
+    if not all_files:
+        raise ValueError("No CSV files found!")
+    
+    df_list = []
+    encodings = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(all_files)))) as pool:
+        futures = [pool.submit(read_annotated_file, filename) for filename in all_files]
+        for filename, future in zip(all_files, futures):
+            try:
+                df, encoding = future.result()
+            except Exception as e:
+                print(f"Failed to read {filename}: {e}")
+                continue
+            print(f"Read {os.path.basename(filename)} ({encoding}, {len(df)} lines)")
+            df_list.append(df)
+            encodings[os.path.basename(filename)] = encoding
+    
+    if not df_list:
+        raise ValueError("No CSV files could be read!")
+        
+    combined_df = pd.concat(df_list, ignore_index=True)
+    if "annotation" in combined_df:
+        # Lines not annotated yet belong to no topic; leave them out, as
+        # grouping by annotation always did
+        unannotated = combined_df["annotation"].isna()
+        if unannotated.any():
+            print(f"Skipping {unannotated.sum()} lines without an annotation")
+            combined_df = combined_df[~unannotated].reset_index(drop=True)
+    # Categories are set after concat, so every file shares one dictionary
+    for col in ("character", "episode"):
+        if col in combined_df:
+            combined_df[col] = combined_df[col].astype("category")
+    if "annotation" in combined_df:
+        combined_df["annotation"] = combined_df["annotation"].astype("int64")
+    combined_df.attrs["encodings"] = encodings
+    return combined_df
@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# Throughput benchmarks for the pipeline stages:
+#
+#   format     format.format_script_text over the raw scripts
+#   extract    extract.extract_dialogue_from_file over the formatted scripts
+#   normalize  extract.normalize_character_name over every dialogue block's cue
+#   topics     analyze_topics.compute_tfidf_top_words over the annotated CSVs
+#
+# The corpus is the scripts in data/raw_scripts (and the annotated CSVs for
+# topics), scaled up by repeating it --scale times. Every stage runs in its
+# own fresh process, so its peak RSS isn't inflated by earlier stages.
+# Results can be saved as a JSON baseline and compared against later runs.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+STAGES = ["format", "extract", "normalize", "topics"]
+
+
+def peak_rss_mb():
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_raw_texts(data_dir):
+    """(filename, text) of every raw script, decoded like format.py does."""
+    folder = os.path.join(data_dir, "raw_scripts")
+    texts = []
+    for filename in sorted(os.listdir(folder)):
+        if filename.lower().endswith(".txt"):
+            with open(os.path.join(folder, filename), "rb") as f:
+                text = f.read().decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+            texts.append((filename, text))
+    return texts
+
+
+def synthetic_corpus(texts, scale):
+    """The corpus repeated `scale` times, with a distinct name per copy."""
+    for copy in range(scale):
+        for filename, text in texts:
+            stem, ext = os.path.splitext(filename)
+            yield f"{stem}__{copy:03d}{ext}", text
+
+
+def write_corpus(corpus, folder):
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for filename, text in corpus:
+        path = os.path.join(folder, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+
+def count_text(texts):
+    return sum(text.count("\n") + 1 for text in texts), sum(len(text.encode("utf-8")) for text in texts)
+
+
+def prepare_stage(stage, data_dir, scale, work_dir):
+    """Builds the stage input outside the timed section.
+
+    Returns (run, lines, bytes): run() does the measured work once.
+    """
+    if stage == "format":
+        from format import format_script_text
+
+        texts = [text for _, text in synthetic_corpus(load_raw_texts(data_dir), scale)]
+        lines, size = count_text(texts)
+        return lambda: [format_script_text(text) for text in texts], lines, size
+
+    if stage == "extract":
+        from format import format_script_text
+        from extract import extract_dialogue_from_file
+
+        formatted = [(name, format_script_text(text)) for name, text in load_raw_texts(data_dir)]
+        paths = write_corpus(synthetic_corpus(formatted, scale), os.path.join(work_dir, "formatted"))
+        lines, size = count_text([text for _, text in formatted])
+        return lambda: [extract_dialogue_from_file(path) for path in paths], lines * scale, size * scale
+
+    if stage == "normalize":
+        from extract import extract_dialogue_from_file, normalize_character_name
+
+        folder = os.path.join(data_dir, "formatted_scripts")
+        cues = [
+            character
+            for filename in sorted(os.listdir(folder))
+            for character, _ in extract_dialogue_from_file(os.path.join(folder, filename))
+        ] * scale
+        return lambda: [normalize_character_name(cue) for cue in cues], len(cues), sum(len(c) for c in cues)
+
+    if stage == "topics":
+        import pandas as pd
+        from analyze_topics import compute_tfidf_top_words, load_data
+
+        df = load_data(data_dir)
+        df = pd.concat([df] * scale, ignore_index=True)
+        lines, size = count_text(df["dialogue"].astype(str).tolist())
+        return lambda: compute_tfidf_top_words(df), len(df), size
+
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def run_stage(stage, data_dir, scale, repeat):
+    """Runs one stage `repeat` times and returns its best-time measurements."""
+    work_dir = tempfile.mkdtemp(prefix=f"bench-{stage}-")
+    try:
+        run, lines, size = prepare_stage(stage, data_dir, scale, work_dir)
+        rss_before = peak_rss_mb()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    best = min(times)
+    rss_peak = peak_rss_mb()
+    return {
+        "stage": stage,
+        "scale": scale,
+        "lines": lines,
+        "mb": size / 1e6,
+        "seconds": best,
+        "lines_per_sec": lines / best if best else None,
+        "mb_per_sec": size / 1e6 / best if best else None,
+        "peak_rss_mb": rss_peak,
+        # Peak growth during the timed runs, on top of the prepared input
+        "stage_rss_mb": max(0.0, rss_peak - rss_before),
+        "times": times,
+    }
+
+
+def run_benchmarks(stages, scales, data_dir=DATA_DIR, repeat=3):
+    results = []
+    # spawn: every stage starts from a clean interpreter, even on Linux
+    context = get_context("spawn")
+    for scale in scales:
+        for stage in stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_stage, stage, data_dir, scale, repeat).result()
+            print_result(result)
+            results.append(result)
+    return results
+
+
+def print_result(result, baseline=None):
+    line = (f"{result['stage']:<10} x{result['scale']:<4} {result['seconds']:8.3f}s "
+            f"{result['lines_per_sec']:12,.0f} lines/s {result['mb_per_sec']:8.2f} MB/s "
+            f"peak RSS {result['peak_rss_mb']:7.1f} MB (+{result['stage_rss_mb']:.1f})")
+    if baseline:
+        line += f"  {result['lines_per_sec'] / baseline['lines_per_sec']:.2f}x baseline"
+    print(line)
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def save_baseline(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=1)
+
+
+def load_baseline(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(results, baseline):
+    """Prints every result next to the matching (stage, scale) baseline."""
+    previous = {(r["stage"], r["scale"]): r for r in baseline["results"]}
+    print(f"\nCompared to baseline from {baseline['environment'].get('time', '?')}:")
+    for result in results:
+        print_result(result, previous.get((result["stage"], result["scale"])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the format/extract/topic stages.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1],
+                        help="corpus sizes, as multiples of the raw scripts (e.g. 1 10 100)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage; the best is kept")
+    parser.add_argument("--save", metavar="JSON", help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="compare the results against a saved baseline")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="folder holding raw_scripts, formatted_scripts and the annotated CSVs (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.stages, args.scale, os.path.abspath(args.data_dir), args.repeat)
+    if args.compare:
+        compare(results, load_baseline(args.compare))
+    if args.save:
+        save_baseline(args.save, results)
+        print(f"Baseline saved to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
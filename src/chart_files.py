@@ -0,0 +1,8 @@
+# Output file naming shared by generate_chart.py and piechart.py, which both
+# save one chart per episode, character or season.
+
+
+def safe_filename(name):
+    """`name` with every character that isn't a letter or digit replaced by
+    "_", for use in a chart's file name."""
+    return "".join(c if c.isalnum() else "_" for c in str(name)).strip("_") or "chart"
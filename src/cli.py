@@ -0,0 +1,53 @@
+import sys
+import argparse
+import importlib
+
+# Single entry point for every script in src/, run from this folder:
+#
+#   python -m cli [--data-dir DIR] <command> [command options...]
+#
+# Each command's module is only imported once the command is picked, so
+# format/extract never load pandas, and scikit-learn is only loaded by
+# topics, topic-stats and bench's TF-IDF stage.
+
+# command -> (module, description)
+COMMANDS = {
+    "format": ("format", "unify the layout of the raw scripts"),
+    "extract": ("extract", "extract character dialogue into the cleaned CSV"),
+    "topics": ("analyze_topics", "top TF-IDF words per topic or other grouping"),
+    "topic-stats": ("topic_stats", "incrementally updated term statistics per topic"),
+    "charts": ("generate_chart", "topic distribution bar charts"),
+    "piechart": ("piechart", "side character pie charts"),
+    "mentions": ("family_mentions", "family member mention matrix"),
+    "interactions": ("interactions", "speaker turns and scene co-presence between characters"),
+    "index": ("dialogue_index", "build or query the inverted index of the cleaned dialogue"),
+    "aliases": ("aliases", "propose and save merges of misspelled character names"),
+    "bench": ("benchmark", "throughput benchmarks of the pipeline stages"),
+}
+
+
+def main(argv=None):
+    width = max(map(len, COMMANDS))
+    parser = argparse.ArgumentParser(
+        prog="python -m cli",
+        description="Simpsons script analysis.",
+        epilog="commands:\n" + "\n".join(f"  {name:<{width}} {help}" for name, (_, help) in COMMANDS.items())
+               + "\n\nRun a command with --help for its options.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--data-dir", help="data folder passed to the command (default: the repo's data/)")
+    parser.add_argument("command", choices=list(COMMANDS), metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    # So the command's own --help and usage errors name the right program
+    sys.argv[0] = f"python -m cli {args.command}"
+    command_argv = list(args.args)
+    if args.data_dir:
+        command_argv = ["--data-dir", args.data_dir] + command_argv
+    return module.main(command_argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import os
+import json
+import shutil
+
+import numpy as np
+
+# Columnar copy of simpsons_dialogue_cleaned.csv, partitioned by episode:
+#
+#   dialogue_columns/
+#     dictionary.json        character and episode dictionaries + partition list
+#     part-00000/
+#       character.npy        int32 codes into the character dictionary
+#       dialogue_offsets.npy int64, len(rows) + 1 offsets into dialogue.bin
+#       dialogue.bin         every dialogue of the partition as one UTF-8 buffer
+#
+# All rows of a partition share one episode, so the episode column is stored
+# once per partition (its dictionary code) instead of once per row.
+
+DICTIONARY_FILE = "dictionary.json"
+
+
+def _write_partition(folder, character_codes, dialogues):
+    os.makedirs(folder)
+    encoded = [d.encode("utf-8") for d in dialogues]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    np.save(os.path.join(folder, "character.npy"), np.asarray(character_codes, dtype=np.int32))
+    np.save(os.path.join(folder, "dialogue_offsets.npy"), offsets)
+    with open(os.path.join(folder, "dialogue.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+
+
+def write_rows_through(rows, out_dir, characters=None):
+    """Passes (character, dialogue, episode, ...) rows through unchanged
+    while writing them as a columnar dataset to `out_dir`.
+
+    Rows must come grouped by episode (as the cleaned CSV is sorted); one
+    partition is written per episode, so only one episode's rows are held in
+    memory. `characters` optionally fixes the order of the character
+    dictionary; names not in it are appended as they appear.
+    """
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    character_ids = {name: i for i, name in enumerate(characters or [])}
+    episodes = []
+    partitions = []
+    current_episode = None
+    codes, dialogues = [], []
+
+    def flush():
+        if not codes:
+            return
+        name = f"part-{len(partitions):05d}"
+        _write_partition(os.path.join(tmp_dir, name), codes, dialogues)
+        partitions.append({"path": name, "episode": len(episodes) - 1, "rows": len(codes)})
+
+    for row in rows:
+        character, dialogue, episode = row[:3]
+        if episode != current_episode:
+            flush()
+            codes, dialogues = [], []
+            current_episode = episode
+            episodes.append(episode)
+        codes.append(character_ids.setdefault(character, len(character_ids)))
+        dialogues.append(dialogue)
+        yield row
+    flush()
+
+    with open(os.path.join(tmp_dir, DICTIONARY_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "characters": list(character_ids),
+            "episodes": episodes,
+            "partitions": partitions,
+        }, f, indent=1)
+
+    # Swap the finished dataset in place of the old one
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+
+
+def write_dataset(rows, out_dir, characters=None):
+    for _ in write_rows_through(rows, out_dir, characters):
+        pass
+
+
+class DialogueDataset:
+    """Read side of a columnar dialogue dataset.
+
+    Column files are memory-mapped and only touched when a partition is
+    actually read, so opening the dataset and filtering by episode or
+    character costs next to nothing.
+    """
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        self.mmap_mode = "r" if mmap else None
+        with open(os.path.join(path, DICTIONARY_FILE), "r", encoding="utf-8") as f:
+            dictionary = json.load(f)
+        self.characters = dictionary["characters"]
+        self.episodes = dictionary["episodes"]
+        self.partitions = dictionary["partitions"]
+        self.character_ids = {name: i for i, name in enumerate(self.characters)}
+        self.episode_ids = {name: i for i, name in enumerate(self.episodes)}
+        self._columns = {}
+
+    def __len__(self):
+        return sum(p["rows"] for p in self.partitions)
+
+    def _partition_columns(self, index):
+        if index not in self._columns:
+            folder = os.path.join(self.path, self.partitions[index]["path"])
+            codes = np.load(os.path.join(folder, "character.npy"), mmap_mode=self.mmap_mode)
+            offsets = np.load(os.path.join(folder, "dialogue_offsets.npy"), mmap_mode=self.mmap_mode)
+            buffer_path = os.path.join(folder, "dialogue.bin")
+            if self.mmap_mode and os.path.getsize(buffer_path):
+                buffer = np.memmap(buffer_path, dtype=np.uint8, mode="r")
+            else:
+                buffer = np.fromfile(buffer_path, dtype=np.uint8)
+            self._columns[index] = (codes, offsets, buffer)
+        return self._columns[index]
+
+    def _partition_indices(self, episode):
+        if episode is None:
+            return range(len(self.partitions))
+        episode_id = self.episode_ids.get(episode)
+        return [i for i, p in enumerate(self.partitions) if p["episode"] == episode_id]
+
+    def select(self, character=None, episode=None):
+        """Yields (partition index, row positions) for the matching rows."""
+        character_id = None
+        if character is not None:
+            character_id = self.character_ids.get(character)
+            if character_id is None:
+                return
+        for index in self._partition_indices(episode):
+            codes = self._partition_columns(index)[0]
+            if character_id is None:
+                yield index, np.arange(len(codes))
+            else:
+                yield index, np.flatnonzero(codes == character_id)
+
+    def rows(self, character=None, episode=None):
+        """Yields (character, dialogue, episode) tuples, optionally filtered."""
+        for index, positions in self.select(character, episode):
+            codes, offsets, buffer = self._partition_columns(index)
+            episode_name = self.episodes[self.partitions[index]["episode"]]
+            for i in positions:
+                dialogue = bytes(buffer[offsets[i]:offsets[i + 1]]).decode("utf-8")
+                yield self.characters[codes[i]], dialogue, episode_name
+
+    def count(self, character=None, episode=None):
+        return sum(len(positions) for _, positions in self.select(character, episode))
+
+    def to_frame(self, character=None, episode=None):
+        """Matching rows as a DataFrame with categorical character/episode."""
+        import pandas as pd
+
+        rows = list(self.rows(character, episode))
+        df = pd.DataFrame(rows, columns=["character", "dialogue", "episode"])
+        df["character"] = pd.Categorical(df["character"], categories=self.characters)
+        df["episode"] = pd.Categorical(df["episode"], categories=self.episodes)
+        return df
+
+
+def load_dataset(path, mmap=True):
+    return DialogueDataset(path, mmap)
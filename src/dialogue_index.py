@@ -0,0 +1,277 @@
+import os
+import re
+import mmap
+import csv
+import json
+import shutil
+import argparse
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# Inverted index over simpsons_dialogue_cleaned.csv:
+#
+#   dialogue_index/
+#     dictionary.json       terms, character and episode dictionaries
+#     term_offsets.npy      int64, len(terms) + 1 offsets into postings.npy
+#     postings.npy          row IDs of every term, delta-encoded (first ID,
+#                           then gaps), in the smallest unsigned dtype that fits
+#     row_character.npy     int32 character code of every row
+#     row_episode.npy       int32 episode code of every row
+#     dialogue_offsets.npy  int64, len(rows) + 1 offsets into dialogue.bin
+#     dialogue.bin          every dialogue as one UTF-8 buffer
+#
+# Row IDs are the CSV's data row numbers, starting at 0. Everything is
+# memory-mapped on load, so a term lookup only decodes that term's postings.
+# Phrases are answered by intersecting their terms' postings, then checking
+# the candidate lines' text.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+DICTIONARY_FILE = "dictionary.json"
+INDEX_VERSION = 1
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return WORD_RE.findall(text.lower())
+
+
+def _delta_encode(row_lists):
+    offsets = np.zeros(len(row_lists) + 1, dtype=np.int64)
+    np.cumsum([len(rows) for rows in row_lists], out=offsets[1:])
+    postings = np.empty(offsets[-1], dtype=np.int64)
+    for i, rows in enumerate(row_lists):
+        postings[offsets[i]:offsets[i + 1]] = rows
+        # gaps, except for the first row ID of each list
+        postings[offsets[i] + 1:offsets[i + 1]] = np.diff(rows)
+    largest = int(postings.max()) if len(postings) else 0
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if largest <= np.iinfo(dtype).max:
+            return offsets, postings.astype(dtype)
+    return offsets, postings.astype(np.uint64)
+
+
+def build_index(rows, out_dir):
+    """Indexes (character, dialogue, episode) rows into `out_dir`.
+
+    The index is written to a temporary folder first and swapped into place
+    once complete. Returns the number of rows indexed.
+    """
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    term_rows = defaultdict(list)
+    character_ids = {}
+    episode_ids = {}
+    character_codes, episode_codes, encoded = [], [], []
+
+    for row_id, (character, dialogue, episode) in enumerate(rows):
+        character_codes.append(character_ids.setdefault(character, len(character_ids)))
+        episode_codes.append(episode_ids.setdefault(episode, len(episode_ids)))
+        encoded.append(dialogue.encode("utf-8"))
+        # dict.fromkeys: each term once per row, in order
+        for term in dict.fromkeys(tokenize(dialogue)):
+            term_rows[term].append(row_id)
+
+    terms = sorted(term_rows)
+    term_offsets, postings = _delta_encode([term_rows[term] for term in terms])
+    dialogue_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=dialogue_offsets[1:])
+
+    np.save(os.path.join(tmp_dir, "term_offsets.npy"), term_offsets)
+    np.save(os.path.join(tmp_dir, "postings.npy"), postings)
+    np.save(os.path.join(tmp_dir, "row_character.npy"), np.asarray(character_codes, dtype=np.int32))
+    np.save(os.path.join(tmp_dir, "row_episode.npy"), np.asarray(episode_codes, dtype=np.int32))
+    np.save(os.path.join(tmp_dir, "dialogue_offsets.npy"), dialogue_offsets)
+    with open(os.path.join(tmp_dir, "dialogue.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    with open(os.path.join(tmp_dir, DICTIONARY_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": INDEX_VERSION,
+            "rows": len(encoded),
+            "terms": terms,
+            "characters": list(character_ids),
+            "episodes": list(episode_ids),
+        }, f)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return len(encoded)
+
+
+def build_index_from_csv(csv_path, out_dir):
+    with open(csv_path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)  # header
+        return build_index(((row[0], row[1], row[2]) for row in reader), out_dir)
+
+
+class DialogueIndex:
+    """Read side of a dialogue index: term, phrase and facet queries.
+
+    Queries return sorted numpy arrays of row IDs; line() and lines() turn
+    them back into (character, dialogue, episode) tuples.
+    """
+
+    def __init__(self, path, use_mmap=True):
+        self.path = path
+        mmap_mode = "r" if use_mmap else None
+        with open(os.path.join(path, DICTIONARY_FILE), "r", encoding="utf-8") as f:
+            dictionary = json.load(f)
+        if dictionary.get("version") != INDEX_VERSION:
+            raise ValueError(f"{path} was built by a different index version; rebuild it")
+        self.terms = dictionary["terms"]
+        self.characters = dictionary["characters"]
+        self.episodes = dictionary["episodes"]
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.character_ids = {name: i for i, name in enumerate(self.characters)}
+        self.episode_ids = {name: i for i, name in enumerate(self.episodes)}
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+
+        self.term_offsets = load("term_offsets.npy")
+        self.postings = load("postings.npy")
+        self.row_character = load("row_character.npy")
+        self.row_episode = load("row_episode.npy")
+        self.dialogue_offsets = load("dialogue_offsets.npy")
+        # Plain bytes-like buffer: slicing it is much cheaper than slicing
+        # a numpy memmap and converting to bytes
+        with open(os.path.join(path, "dialogue.bin"), "rb") as f:
+            if mmap_mode and os.fstat(f.fileno()).st_size:
+                self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.buffer = f.read()
+
+    def __len__(self):
+        return len(self.row_character)
+
+    def term_rows(self, term):
+        """Row IDs of the lines containing `term` (one word, any case)."""
+        term_id = self.term_ids.get(term.lower())
+        if term_id is None:
+            return np.empty(0, dtype=np.int64)
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return np.cumsum(self.postings[start:end], dtype=np.int64)
+
+    def dialogue(self, row_id):
+        start, end = self.dialogue_offsets[row_id], self.dialogue_offsets[row_id + 1]
+        return self.buffer[start:end].decode("utf-8")
+
+    def dialogues(self, row_ids):
+        """Dialogue text of many rows, looking up all their offsets at once."""
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        starts = self.dialogue_offsets[row_ids].tolist()
+        ends = self.dialogue_offsets[row_ids + 1].tolist()
+        return [self.buffer[start:end].decode("utf-8") for start, end in zip(starts, ends)]
+
+    def line(self, row_id):
+        return (self.characters[self.row_character[row_id]], self.dialogue(row_id),
+                self.episodes[self.row_episode[row_id]])
+
+    def lines(self, row_ids):
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        return [
+            (self.characters[character], dialogue, self.episodes[episode])
+            for character, dialogue, episode in zip(
+                self.row_character[row_ids].tolist(), self.dialogues(row_ids), self.row_episode[row_ids].tolist()
+            )
+        ]
+
+    def _facet_mask(self, rows, codes, ids, names):
+        if isinstance(names, str):
+            names = [names]
+        wanted = [ids[name] for name in names if name in ids]
+        return np.isin(codes[rows], wanted)
+
+    def search(self, text=None, phrase=False, character=None, episode=None):
+        """Row IDs matching every filter given.
+
+        `text` matches lines containing all its words (in any order), or
+        the words in sequence if `phrase` is set. `character` and `episode`
+        are a name or a list of names. With no text, the facets are
+        applied to every row; text without any indexed word (only
+        punctuation, say) matches nothing.
+        """
+        words = tokenize(text) if text else []
+        if text and not words:
+            rows = np.empty(0, dtype=np.int64)
+        elif words:
+            # Intersect the shortest postings first
+            postings = sorted((self.term_rows(word) for word in set(words)), key=len)
+            rows = postings[0]
+            for other in postings[1:]:
+                if not len(rows):
+                    break
+                rows = np.intersect1d(rows, other, assume_unique=True)
+        else:
+            rows = np.arange(len(self), dtype=np.int64)
+
+        if character is not None:
+            rows = rows[self._facet_mask(rows, self.row_character, self.character_ids, character)]
+        if episode is not None:
+            rows = rows[self._facet_mask(rows, self.row_episode, self.episode_ids, episode)]
+
+        if phrase and len(words) > 1:
+            # The words as consecutive tokens: separated only by non-word
+            # characters, and not part of longer tokens at either end
+            phrase_re = re.compile(r"(?<![a-z0-9])" + r"[^a-z0-9]+".join(words) + r"(?![a-z0-9])")
+            keep = [bool(phrase_re.search(dialogue.lower())) for dialogue in self.dialogues(rows)]
+            rows = rows[np.array(keep, dtype=bool)]
+        return rows
+
+    def count_by(self, rows, facet="character"):
+        """Counter of the matched rows per character or per episode."""
+        if facet == "character":
+            codes, names = self.row_character, self.characters
+        elif facet == "episode":
+            codes, names = self.row_episode, self.episodes
+        else:
+            raise ValueError(f"Unknown facet: {facet}")
+        counts = np.bincount(codes[rows], minlength=len(names))
+        return Counter({names[i]: int(n) for i, n in enumerate(counts) if n})
+
+
+def load_index(path, use_mmap=True):
+    return DialogueIndex(path, use_mmap)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the inverted index of the cleaned dialogue.")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="folder holding simpsons_dialogue_cleaned.csv and dialogue_index (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    subparsers.add_parser("build", help="(re)build the index from the cleaned CSV")
+    query = subparsers.add_parser("query", help="search the index")
+    query.add_argument("text", nargs="?", help="words every line must contain")
+    query.add_argument("--phrase", action="store_true", help="the words must appear in sequence")
+    query.add_argument("--character", nargs="+", help="only lines by these characters")
+    query.add_argument("--episode", nargs="+", help="only lines from these episodes")
+    query.add_argument("--by", choices=["character", "episode"], help="print counts per facet instead of lines")
+    query.add_argument("--limit", type=int, default=20, help="lines to print (default: 20)")
+    args = parser.parse_args(argv)
+
+    index_dir = os.path.join(args.data_dir, "dialogue_index")
+    if args.action == "build":
+        count = build_index_from_csv(os.path.join(args.data_dir, "simpsons_dialogue_cleaned.csv"), index_dir)
+        print(f"Indexed {count} lines into {index_dir}")
+        return
+
+    index = load_index(index_dir)
+    characters = [name.upper() for name in args.character] if args.character else None
+    rows = index.search(args.text, args.phrase, characters, args.episode)
+    print(f"{len(rows)} matching lines")
+    if args.by:
+        for name, count in index.count_by(rows, args.by).most_common():
+            print(f"  {count:6d}  {name}")
+    else:
+        for character, dialogue, episode in index.lines(rows[:args.limit]):
+            print(f"[{episode}] {character}: {dialogue}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,53 @@
 import os
 import csv
 import re
-from collections import defaultdict
+import json
+import argparse
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from itertools import chain, islice
+
+from format import FORMAT_VERSION, iter_formatted_lines, write_lines_through
+from manifest import bytes_hash, load_manifest, rules_version, save_manifest, stage_entries, update_stage
+from profiling import RunStats, write_report
+from script_io import IO_THREADS, prefetch, read_hashed_text, text_lines
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "Data")
+DATA_DIR = os.path.join(BASE_DIR, "data")
 
 SCRIPTS_FOLDER = os.path.join(DATA_DIR, "formatted_scripts")  # input folder
+RAW_SCRIPTS_FOLDER = os.path.join(DATA_DIR, "raw_scripts")  # input folder for --from-raw
 OUTPUT_CSV = os.path.join(DATA_DIR, "simpsons_dialogue_cleaned.csv")
 STATS_CSV = os.path.join(DATA_DIR, "character_line_counts.csv")
+MANIFEST_PATH = os.path.join(DATA_DIR, "manifest.json")
+CACHE_FOLDER = os.path.join(DATA_DIR, "extract_cache")  # per-episode extraction results
+COLUMNAR_FOLDER = os.path.join(DATA_DIR, "dialogue_columns")  # optional columnar copy of OUTPUT_CSV
+INTERACTIONS_PATH = os.path.join(DATA_DIR, "interactions.npz")  # optional speaker turn/co-presence matrices
+
+
+def set_data_dir(data_dir):
+    """Points the input/output paths above at another data folder."""
+    global DATA_DIR, SCRIPTS_FOLDER, RAW_SCRIPTS_FOLDER, OUTPUT_CSV, STATS_CSV
+    global MANIFEST_PATH, CACHE_FOLDER, COLUMNAR_FOLDER, INTERACTIONS_PATH
+    DATA_DIR = data_dir
+    SCRIPTS_FOLDER = os.path.join(DATA_DIR, "formatted_scripts")
+    RAW_SCRIPTS_FOLDER = os.path.join(DATA_DIR, "raw_scripts")
+    OUTPUT_CSV = os.path.join(DATA_DIR, "simpsons_dialogue_cleaned.csv")
+    STATS_CSV = os.path.join(DATA_DIR, "character_line_counts.csv")
+    MANIFEST_PATH = os.path.join(DATA_DIR, "manifest.json")
+    CACHE_FOLDER = os.path.join(DATA_DIR, "extract_cache")
+    COLUMNAR_FOLDER = os.path.join(DATA_DIR, "dialogue_columns")
+    INTERACTIONS_PATH = os.path.join(DATA_DIR, "interactions.npz")
+
+# The episode title is only looked for in the first lines of a script
+EPISODE_TITLE_SCAN_LINES = 21
+
+# RunStats of the script being parsed with --profile, None otherwise. Every
+# hook below only runs after a rule already matched, behind one None check,
+# so runs without --profile pay next to nothing
+STATS = None
 
 # Regex for a character cue
 CHARACTER_RE = re.compile(
@@ -158,6 +197,13 @@ SCRIPT_METADATA_PATTERNS = [
     r"^(REVISED|FINAL|TABLE|DELIVERY)\b",
 ]
 
+# Scene headings (sluglines); each one starts a new scene
+SCENE_HEADING_PATTERNS = [
+    r"^INT\.",
+    r"^EXT\.",
+    r"^Sce+ne? \d+",
+]
+
 # Manual character mapping: maps variant names to canonical names
 CHARACTER_MAPPING = {
     "MONROE": "MARVIN MONROE",
@@ -200,37 +246,77 @@ CHARACTER_MAPPING = {
 
 }
 
+def compile_rules(patterns, flags=0):
+    """Builds one alternation out of a rule table, one named group per rule."""
+    return re.compile(
+        "|".join(f"(?P<r{i}>{pat})" for i, pat in enumerate(patterns)), flags
+    )
+
+# Each rule table compiled once into a single matcher
+NON_DIALOGUE_RE = compile_rules(NON_DIALOGUE_PATTERNS)
+SCENE_RE = compile_rules(SCENE_PATTERNS)
+SCRIPT_METADATA_RE = compile_rules(SCRIPT_METADATA_PATTERNS, re.IGNORECASE)
+SCENE_HEADING_RE = compile_rules(SCENE_HEADING_PATTERNS, re.IGNORECASE)
+
+def matched_rule(rules_re, patterns, text, search=False):
+    """Returns the pattern from `patterns` that matched `text`, or None."""
+    m = rules_re.search(text) if search else rules_re.match(text)
+    if m:
+        return patterns[int(m.lastgroup[1:])]
+    return None
+
+REGEX_METACHARS = set(".^$*+?{}[]\\|()")
+
+def split_literal_rules(patterns):
+    """Splits a table of ^...$ patterns into exact strings and real regexes.
+
+    Patterns that only spell out a plain string go into a dict (string →
+    pattern) for a hash lookup; everything else stays a regex.
+    """
+    literals = {}
+    regexes = []
+    for pat in patterns:
+        body = pat[1:] if pat.startswith("^") else pat  # re.match anchors anyway
+        if body.endswith("$") and not any(c in REGEX_METACHARS for c in body[:-1]):
+            literals[body[:-1]] = pat
+        else:
+            regexes.append(pat)
+    return literals, regexes
+
+# Most episode titles are plain strings: look those up in a hash table and
+# only run the few real regexes (e.g. "MR. PLOW") as one alternation
+EPISODE_TITLE_LITERALS, EPISODE_TITLE_REGEXES = split_literal_rules(EPISODE_TITLE_PATTERNS)
+EPISODE_TITLE_RE = compile_rules(EPISODE_TITLE_REGEXES)
+
+def matched_episode_title_rule(text):
+    """Returns the EPISODE_TITLE_PATTERNS entry matching `text`, or None."""
+    pat = EPISODE_TITLE_LITERALS.get(text)
+    if pat:
+        return pat
+    return matched_rule(EPISODE_TITLE_RE, EPISODE_TITLE_REGEXES, text)
+
 def is_scene_direction(line):
     stripped = line.strip()
-    for pat in NON_DIALOGUE_PATTERNS:
-        if re.match(pat, stripped):
-            return True
+    rule = matched_rule(NON_DIALOGUE_RE, NON_DIALOGUE_PATTERNS, stripped)
+    if rule:
+        if STATS is not None:
+            STATS.hit("NON_DIALOGUE_PATTERNS", rule)
+        return True
     if stripped.isupper() and len(stripped.split()) <= 4 and not stripped.endswith('.'):
+        if STATS is not None:
+            STATS.hit("heuristics", "short all-caps line is a scene direction")
         return True
     return False
 
 def is_script_metadata(line):
     stripped = line.strip()
-    for pat in SCRIPT_METADATA_PATTERNS:
-        if re.search(pat, stripped, re.IGNORECASE):
-            return True
-    return False
-
-def is_episode_title_line(name):
-    for pat in EPISODE_TITLE_PATTERNS:
-        if re.match(pat, name):
-            return True
-    words = name.split()
-    if len(words) >= 4:
+    rule = matched_rule(SCRIPT_METADATA_RE, SCRIPT_METADATA_PATTERNS, stripped, search=True)
+    if rule:
+        if STATS is not None:
+            STATS.hit("SCRIPT_METADATA_PATTERNS", rule)
         return True
     return False
 
-def is_scene_annotation(name):
-    for pat in SCENE_PATTERNS:
-        if re.search(pat, name):
-            return True
-    return False
-
 def normalize_character_name(name):
     name = re.sub(r"'S\s.*$", "", name)
     name = re.sub(r"\s+VOICE$", "", name)
@@ -244,14 +330,40 @@ def normalize_character_name(name):
     
     return name
 
-def should_keep_character(name):
-    if is_episode_title_line(name):
-        return False
-    if is_scene_annotation(name):
-        return False
+@lru_cache(maxsize=None)
+def character_drop_reason(name):
+    """Why a character cue is dropped, as (reason, rule table, rule), or None
+    if it is kept. The one character filter: should_keep_character and the
+    --profile drop reasons both come from here."""
+    rule = matched_episode_title_rule(name)
+    if rule:
+        return "episode title", "EPISODE_TITLE_PATTERNS", rule
+    if len(name.split()) >= 4:
+        return "cue of 4+ words", None, None
+    rule = matched_rule(SCENE_RE, SCENE_PATTERNS, name, search=True)
+    if rule:
+        return "scene annotation", "SCENE_PATTERNS", rule
     if len(name) <= 1:
-        return False
-    return True
+        return "cue of 1 character", None, None
+    return None
+
+def should_keep_character(name):
+    return character_drop_reason(name) is None
+
+@lru_cache(maxsize=None)
+def resolve_character(name):
+    """Canonical name for a raw character cue, or None if the cue is dropped.
+
+    Memoized: a script archive only has a few hundred distinct cues, so the
+    filters and the normalization regexes run once per cue, not once per
+    dialogue block. Every block of a cue also shares one name string.
+    """
+    # Check if we should keep this entry
+    if not should_keep_character(name):
+        return None
+
+    # Normalize the character name
+    return normalize_character_name(name)
 
 def clean_dialogue(text):
     text = re.sub(r"\([^)]*\)", "", text).strip()
@@ -263,39 +375,64 @@ def save_dialogue_block(dialogues, character, dialogue_lines):
         if combined_dialogue:
             dialogues.append((character, combined_dialogue))
 
-def extract_episode_title(path):
+def fallback_episode_title(path):
     filename = os.path.basename(path)
     title = os.path.splitext(filename)[0]
-    
+
+    # Clean up filename to make it more readable
+    title = re.sub(r"[_-]", " ", title)
+    title = title.upper()
+
+    return title
+
+def find_episode_title(lines):
+    """Returns the first of `lines` that is a known episode title, or None."""
+    for line in lines:
+        stripped = line.strip()
+        rule = matched_episode_title_rule(stripped)
+        if rule:
+            if STATS is not None:
+                STATS.hit("EPISODE_TITLE_PATTERNS", rule)
+            return stripped
+    return None
+
+def extract_episode_title(path):
     # Try to read the first few lines to find the episode title
     try:
         with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            for i, line in enumerate(f):
-                if i > 20:
-                    break
-                stripped = line.strip()
-                for pat in EPISODE_TITLE_PATTERNS:
-                    if re.match(pat, stripped):
-                        return stripped
+            title = find_episode_title(islice(f, EPISODE_TITLE_SCAN_LINES))
+            if title:
+                return title
     except:
         pass
     
-    # Clean up filename to make it more readable
-    title = re.sub(r"[_-]", " ", title)
-    title = title.upper()
-    
-    return title
+    return fallback_episode_title(path)
 
-def extract_dialogue_from_file(path):
+def extract_dialogue_from_lines(lines, scenes=None):
+    """Runs the dialogue state machine over an iterable of script lines.
+
+    If `scenes` is a list, the scene number of every returned dialogue block
+    (the scene its cue appeared in, counting scene headings from 0) is
+    appended to it.
+    """
     dialogues = []
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        lines = f.readlines()
-    
     current_character = None
     current_dialogue_lines = []
+    scene = block_scene = 0
+
+    def save_block():
+        saved = len(dialogues)
+        save_dialogue_block(dialogues, current_character, current_dialogue_lines)
+        if scenes is not None and len(dialogues) > saved:
+            scenes.append(block_scene)
     
     for line in lines:
         raw = line.rstrip("\n")
+
+        # Scene headings only move the scene counter; they are still handled
+        # as the lines they are below (usually metadata or a dropped cue)
+        if scenes is not None and SCENE_HEADING_RE.match(raw.lstrip()):
+            scene += 1
         
         # Skip script metadata lines
         if is_script_metadata(raw):
@@ -305,21 +442,24 @@ def extract_dialogue_from_file(path):
         m = CHARACTER_RE.match(raw)
         if m:
             # ALWAYS save previous dialogue block when we see a character name
-            save_dialogue_block(dialogues, current_character, current_dialogue_lines)
+            save_block()
             
             # Start new character block
+            block_scene = scene
             name = m.group(1).strip()
             if len(name.split()) <= 5:
                 current_character = name
                 current_dialogue_lines = []
             else:
+                if STATS is not None:
+                    STATS.drop("cue of 6+ words")
                 current_character = None
                 current_dialogue_lines = []
             continue
         # Check for blank line → end of dialogue block
         if not raw.strip():
             # Save the current dialogue block and reset
-            save_dialogue_block(dialogues, current_character, current_dialogue_lines)
+            save_block()
             current_character = None
             current_dialogue_lines = []
             continue
@@ -331,67 +471,389 @@ def extract_dialogue_from_file(path):
                 current_dialogue_lines.append(text)
     
     # Don't forget the last dialogue block
-    save_dialogue_block(dialogues, current_character, current_dialogue_lines)
+    save_block()
     
     return dialogues
 
-def main():
-    # Extract all dialogue from script files
-    all_dialogue = []
-    for filename in os.listdir(SCRIPTS_FOLDER):
-        if filename.lower().endswith((".txt", ".script")):
-            fullpath = os.path.join(SCRIPTS_FOLDER, filename)
-            
-            # Extract episode title
-            episode_title = extract_episode_title(fullpath)
-            
-            # Extract dialogues
-            dialogues = extract_dialogue_from_file(fullpath)
-            
-            # Add episode title to each dialogue entry
-            for character, dialogue in dialogues:
-                all_dialogue.append((character, dialogue, episode_title))
-    
-    # Clean and normalize character names
-    cleaned_data = []
-    character_stats = defaultdict(int)
-    
-    for character, dialogue, episode in all_dialogue:
-        # Check if we should keep this entry
-        if not should_keep_character(character):
+def extract_dialogue_from_file(path):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return extract_dialogue_from_lines(f)
+
+def extract_episode_from_lines(lines, path, scenes=None):
+    """Finds the episode title and extracts the dialogue in a single pass.
+
+    Only the first EPISODE_TITLE_SCAN_LINES lines are buffered for the title
+    lookup; they are then replayed into the dialogue state machine.
+    """
+    lines = iter(lines)
+    head = list(islice(lines, EPISODE_TITLE_SCAN_LINES))
+    episode_title = find_episode_title(head) or fallback_episode_title(path)
+    return episode_title, extract_dialogue_from_lines(chain(head, lines), scenes)
+
+# Bump when the extraction logic changes in a way the rule tables don't show
+EXTRACT_LOGIC_VERSION = 2
+EXTRACT_VERSION = rules_version(
+    CHARACTER_RE.pattern,
+    NON_DIALOGUE_PATTERNS,
+    EPISODE_TITLE_PATTERNS,
+    SCENE_PATTERNS,
+    SCRIPT_METADATA_PATTERNS,
+    SCENE_HEADING_PATTERNS,
+    CHARACTER_MAPPING,
+    EXTRACT_LOGIC_VERSION,
+)
+
+def list_script_files(folder, extensions=(".txt", ".script")):
+    return [
+        os.path.join(folder, filename)
+        for filename in os.listdir(folder)
+        if filename.lower().endswith(extensions)
+    ]
+
+def clean_dialogues(dialogues, episode_title, scenes):
+    """Filters and normalizes the dialogue blocks of one script.
+
+    Returns the kept (character, dialogue, episode) tuples together with the
+    partial character_stats for this file, so runs over several processes can
+    be merged in file order, and the scene number of every kept row.
+    """
+    rows = []
+    file_stats = Counter()
+    kept_scenes = []
+    for (character, dialogue), scene in zip(dialogues, scenes):
+        normalized_character = resolve_character(character)
+        if normalized_character is None:
+            if STATS is not None:
+                reason, table, rule = character_drop_reason(character)
+                STATS.drop(reason)
+                if table:
+                    STATS.hit(table, rule)
             continue
-        
-        # Normalize the character name
-        normalized_character = normalize_character_name(character)
-        
-        # Track statistics
-        character_stats[normalized_character] += 1
-        
-        # Add to cleaned data
-        cleaned_data.append({
-            "character": normalized_character,
-            "dialogue": dialogue,
-            "episode": episode
+
+        file_stats[normalized_character] += 1
+        rows.append((normalized_character, dialogue, episode_title))
+        kept_scenes.append(scene)
+
+    return rows, file_stats, kept_scenes
+
+def process_script_file(path, text):
+    """Extracts, filters and normalizes one formatted script, from its
+    already-read text (see read_hashed_script)."""
+    scenes = []
+    episode_title, dialogues = extract_episode_from_lines(text_lines(text), path, scenes)
+    return clean_dialogues(dialogues, episode_title, scenes)
+
+def read_hashed_script(path):
+    """(hash, text) of a formatted script, decoded like a text-mode open
+    with errors="ignore"."""
+    return read_hashed_text(path, bytes_hash, errors="ignore")
+
+def process_raw_script_file(path, text, formatted_folder=None):
+    """Same as process_script_file, but for a raw script's already-read text
+    (see read_hashed_raw_script): the lines coming out of format.py's
+    formatter go straight into the dialogue state machine, one at a time.
+    The formatted copy is only written if `formatted_folder` is set.
+    """
+    # Lines split exactly like text.splitlines() on the file opened in text mode
+    raw_lines = (line for chunk in text_lines(text) for line in chunk.splitlines())
+    lines = iter_formatted_lines(raw_lines)
+    if formatted_folder:
+        lines = write_lines_through(lines, os.path.join(formatted_folder, os.path.basename(path)))
+
+    scenes = []
+    episode_title, dialogues = extract_episode_from_lines(lines, path, scenes)
+    return clean_dialogues(dialogues, episode_title, scenes)
+
+def profile_script(process, path, **kwargs):
+    """Runs process(path, **kwargs) with the rule/drop counters on and times it.
+
+    Returns (result, RunStats dict). Module-level so it can run in a worker.
+    """
+    global STATS
+    STATS = RunStats()
+    try:
+        start = time.perf_counter()
+        result = process(path, **kwargs)
+        seconds = time.perf_counter() - start
+        STATS.files.append({
+            "file": os.path.basename(path),
+            "seconds": round(seconds, 6),
+            "kept_blocks": len(result[0]),
+            "dropped_blocks": sum(STATS.dropped.values()),
         })
+        return result, STATS.to_dict()
+    finally:
+        STATS = None
+
+def read_hashed_raw_script(path):
+    """(hash, text) of a raw script, strictly decoded as UTF-8."""
+    return read_hashed_text(path, bytes_hash)
+
+def iter_script_files(sources, workers=1, process=process_script_file):
+    """Yields (path, process(path, text=text)) for the (path, text) pairs of
+    `sources`, always in their order; pairs whose text is None are passed
+    through as (path, None).
+
+    With workers > 1, scripts are parsed in a process pool, at most
+    2 * workers of them ahead of the consumer.
+    """
+    if workers <= 1:
+        for path, text in sources:
+            yield path, None if text is None else process(path, text=text)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        running = 0
+        for path, text in sources:
+            pending.append((path, None if text is None else pool.submit(process, path, text=text)))
+            running += text is not None
+            while running > 2 * workers:
+                path, future = pending.popleft()
+                running -= future is not None
+                yield path, None if future is None else future.result()
+        for path, future in pending:
+            yield path, None if future is None else future.result()
+
+def cache_path_for(stage, filename):
+    return os.path.join(CACHE_FOLDER, stage, filename + ".json")
+
+def save_cached_result(stage, path, result):
+    rows, file_stats, scenes = result
+    with open(cache_path_for(stage, os.path.basename(path)), "w", encoding="utf-8") as f:
+        json.dump({"rows": rows, "stats": file_stats, "scenes": scenes}, f)
+
+def load_cached_result(stage, path):
+    with open(cache_path_for(stage, os.path.basename(path)), "r", encoding="utf-8") as f:
+        cached = json.load(f)
+    return [tuple(row) for row in cached["rows"]], Counter(cached["stats"]), cached["scenes"]
+
+def iter_script_results(paths, workers=1, force=False, process=process_script_file,
+                        stage="extract", version=EXTRACT_VERSION, output_folder=None, stats=None,
+                        read=read_hashed_script, io_threads=IO_THREADS):
+    """Yields (path, (rows, file_stats, scenes)) for every script, in order.
+
+    Only scripts whose content (or the extraction rules) changed since the
+    last run are re-parsed. Their results are written to the per-episode
+    cache recorded in the build manifest; everything else is read back from
+    that cache. The manifest is saved once all scripts have been yielded.
+
+    Every script is read once, with `read`: the hash that decides whether it
+    changed comes from the same bytes that are parsed. In a single process,
+    `io_threads` threads read ahead of the parser. With workers > 1 the
+    parent reads serially (the workers already overlap with the reads), so
+    the pool never forks a process that has reader threads running.
+
+    If `output_folder` is given, scripts without a copy there are re-parsed
+    too (used when the streaming pipeline also writes formatted scripts).
+    If `stats` (a RunStats) is given, every re-parsed script is profiled
+    into it.
+    """
+    os.makedirs(os.path.join(CACHE_FOLDER, stage), exist_ok=True)
+
+    manifest = load_manifest(MANIFEST_PATH)
+    previous = stage_entries(manifest, stage, version, force)
+
+    entries = {}
+    stale = []
+
+    def sources():
+        # Texts of unchanged scripts are dropped here, unparsed
+        for path, (source_hash, text) in prefetch(paths, read, io_threads if workers <= 1 else 0):
+            filename = os.path.basename(path)
+            entries[filename] = {"hash": source_hash}
+            if (previous.get(filename) != entries[filename]
+                    or not os.path.exists(cache_path_for(stage, filename))
+                    or (output_folder and not os.path.exists(os.path.join(output_folder, filename)))):
+                stale.append(path)
+                yield path, text
+            else:
+                yield path, None
+
+    if stats is not None:
+        process = partial(profile_script, process)
+    for path, result in iter_script_files(sources(), workers, process):
+        if result is not None:
+            if stats is not None:
+                result, file_stats = result
+                stats.merge(file_stats)
+            save_cached_result(stage, path, result)
+        else:
+            result = load_cached_result(stage, path)
+        yield path, result
+
+    # Drop cache files of scripts that are gone
+    for filename in set(previous) - set(entries):
+        try:
+            os.remove(cache_path_for(stage, filename))
+        except OSError:
+            pass
+
+    update_stage(manifest, stage, version, entries)
+    save_manifest(MANIFEST_PATH, manifest)
+
+    print(f"Parsed {len(stale)} of {len(paths)} scripts ({len(paths) - len(stale)} from cache)")
+
+def write_dialogue_csv(path, rows, columns=("character", "dialogue", "episode")):
+    """Streams (character, dialogue, episode) rows into the cleaned CSV, or
+    rows with one value per entry of `columns`."""
+    with open(path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract character dialogue from formatted scripts.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes used to parse scripts (default: 1)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-parse every script, ignoring the extraction cache")
+    parser.add_argument("--from-raw", action="store_true",
+                        help="stream raw scripts through the formatter instead of reading formatted_scripts")
+    parser.add_argument("--write-formatted", action="store_true",
+                        help="with --from-raw, also write the formatted scripts")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="keep only counts in memory and stream rows back from the cache when writing")
+    parser.add_argument("--columnar", action="store_true",
+                        help="also write a columnar, episode-partitioned copy to dialogue_columns")
+    parser.add_argument("--scenes", action="store_true",
+                        help="add line (order within the script) and scene number columns to the CSV")
+    parser.add_argument("--interactions", action="store_true",
+                        help="also write speaker turn and scene co-presence matrices to interactions.npz")
+    parser.add_argument("--aliases", nargs="?", const="", metavar="JSON",
+                        help="merge character names through an alias mapping (see aliases.py; "
+                             "default file: character_aliases.json in the data folder)")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="folder holding formatted_scripts and the output CSVs (default: %(default)s)")
+    parser.add_argument("--io-threads", type=int, default=IO_THREADS,
+                        help=f"with --workers 1, threads reading upcoming scripts, 0 for serial reads (default: {IO_THREADS})")
+    parser.add_argument("--profile", metavar="JSON",
+                        help="write per-file timings, rule hits and dropped blocks to this JSON report "
+                             "(implies --force, so every script is parsed and counted)")
+    args = parser.parse_args(argv)
+
+    set_data_dir(args.data_dir)
+    stats = RunStats() if args.profile else None
+    # A report over cached scripts would list live rules as never firing
+    if args.profile:
+        args.force = True
+    run_start = time.perf_counter()
+
+    # Extract all dialogue from script files
+    if args.from_raw:
+        formatted_folder = None
+        if args.write_formatted:
+            formatted_folder = SCRIPTS_FOLDER
+            os.makedirs(formatted_folder, exist_ok=True)
+        stage = "pipeline"
+        results = iter_script_results(
+            list_script_files(RAW_SCRIPTS_FOLDER, (".txt",)), args.workers, args.force,
+            process=partial(process_raw_script_file, formatted_folder=formatted_folder),
+            stage=stage, version=rules_version(EXTRACT_VERSION, FORMAT_VERSION),
+            output_folder=formatted_folder, stats=stats,
+            read=read_hashed_raw_script, io_threads=args.io_threads,
+        )
+    else:
+        stage = "extract"
+        results = iter_script_results(list_script_files(SCRIPTS_FOLDER), args.workers, args.force,
+                                      stats=stats, io_threads=args.io_threads)
+
+    # Pass 1: merge per-file results in file order. Every character gets an
+    # interned integer ID on first appearance (the same order a serial run
+    # would count them in), and rows are kept as (ID, dialogue) pairs. Every
+    # row of a file shares the file's episode, so only the episode of each
+    # file needs to be kept. Rows also keep their scene number, and their
+    # position in the list is their line number
+    character_ids = {}
+    character_stats = []
+    episode_files = []
+    kept_rows = {}
+
+    # Aliases are applied here rather than while parsing, so the cached
+    # per-episode results stay valid when the mapping file changes
+    canonical = {}
+    if args.aliases is not None:
+        from aliases import ALIASES_FILE, load_aliases, resolve_alias
+        aliases = load_aliases(args.aliases or os.path.join(args.data_dir, ALIASES_FILE))
+        canonical = {name: resolve_alias(aliases, name) for name in aliases}
+
+    def as_id_rows(rows, scenes):
+        return [
+            (character_ids[canonical.get(character, character)], dialogue, scene)
+            for (character, dialogue, _), scene in zip(rows, scenes)
+        ]
+
+    for path, (rows, file_stats, scenes) in results:
+        for character, count in file_stats.items():
+            character = canonical.get(character, character)
+            character_id = character_ids.setdefault(character, len(character_ids))
+            if character_id == len(character_stats):
+                character_stats.append(0)
+            character_stats[character_id] += count
+
+        if rows:
+            episode_files.append((rows[0][2], path))
+            if not args.low_memory:
+                kept_rows[path] = as_id_rows(rows, scenes)
     
+    characters = list(character_ids)
+    if stats is not None:
+        stats.stages["parse"] += time.perf_counter() - run_start
+        write_start = time.perf_counter()
+
     # Filter out characters with only 1 dialogue block
-    cleaned_data = [
-        entry for entry in cleaned_data
-        if character_stats[entry["character"]] > 9
-    ]
-    character_stats = {char: count for char, count in character_stats.items() if count > 9}
-    
-    # Sort by episode title
-    cleaned_data.sort(key=lambda x: x["episode"])
+    keep = [count > 9 for count in character_stats]
     
+    # Sort by episode title. The sort is stable, so sorting whole files gives
+    # the same row order as sorting every row
+    episode_files.sort(key=lambda x: x[0])
+
+    # Pass 2: emit rows file by file, reading them back from the per-episode
+    # cache in --low-memory mode. With line order and scenes, rows are
+    # (character, dialogue, episode, line, scene). With every_character,
+    # rows of characters below the block threshold are emitted too
+    with_order = args.scenes or args.interactions
+
+    def sorted_rows(every_character=False):
+        for episode, path in episode_files:
+            if path in kept_rows:
+                rows = kept_rows.pop(path)
+            else:
+                cached_rows, _, scenes = load_cached_result(stage, path)
+                rows = as_id_rows(cached_rows, scenes)
+            for line, (character_id, dialogue, scene) in enumerate(rows):
+                if every_character or keep[character_id]:
+                    if with_order:
+                        yield characters[character_id], dialogue, episode, line, scene
+                    else:
+                        yield characters[character_id], dialogue, episode
+
+    rows = sorted_rows(every_character=args.interactions)
+    if args.interactions:
+        # scipy is only needed for this output. Character IDs are the same
+        # as above. Turns and scenes are counted over every speaker, so a
+        # rare character between two lines still breaks their turn; the
+        # block threshold only applies to the CSV
+        from interactions import count_rows_through
+        rows = count_rows_through(rows, INTERACTIONS_PATH, characters)
+        rows = (row if args.scenes else row[:3] for row in rows if keep[character_ids[row[0]]])
+    if args.columnar:
+        # numpy is only needed for this output. The dataset's character
+        # dictionary uses the same IDs as above
+        from columnar import write_rows_through
+        rows = write_rows_through(rows, COLUMNAR_FOLDER, characters)
+
     # Write cleaned dialogue CSV
-    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=["character", "dialogue", "episode"])
-        writer.writeheader()
-        writer.writerows(cleaned_data)
+    if args.scenes:
+        write_dialogue_csv(OUTPUT_CSV, rows, ("character", "dialogue", "episode", "line", "scene"))
+    else:
+        write_dialogue_csv(OUTPUT_CSV, rows)
     
     # Write character line counts to a separate CSV
-    sorted_characters = sorted(character_stats.items(), key=lambda x: x[1], reverse=True)
+    sorted_characters = sorted(
+        ((characters[i], count) for i, count in enumerate(character_stats) if keep[i]),
+        key=lambda x: x[1], reverse=True
+    )
     
     with open(STATS_CSV, "w", newline="", encoding="utf-8") as csvfile:
         writer = csv.writer(csvfile)
@@ -402,6 +864,21 @@ def main():
     print(f"\nCharacter dialogue block counts saved to {STATS_CSV}")
     print(f"Total unique characters: {len(sorted_characters)}")
 
+    if stats is not None:
+        stats.stages["write"] += time.perf_counter() - write_start
+        stats.stages["total"] += time.perf_counter() - run_start
+        # Blocks of characters with too few blocks overall
+        stats.dropped["character with <= 9 blocks"] += sum(
+            count for count, kept in zip(character_stats, keep) if not kept
+        )
+        write_report(args.profile, stats.report({
+            "NON_DIALOGUE_PATTERNS": NON_DIALOGUE_PATTERNS,
+            "SCENE_PATTERNS": SCENE_PATTERNS,
+            "SCRIPT_METADATA_PATTERNS": SCRIPT_METADATA_PATTERNS,
+            "EPISODE_TITLE_PATTERNS": EPISODE_TITLE_PATTERNS,
+        }))
+        print(f"Profile report saved to {args.profile}")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,130 @@
+import os
+import re
+import argparse
+from collections import Counter
+
+import pandas as pd
+
+from annotated_data import read_annotated_file
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+# Python port of the mention counts in family_mentions_analysis.R.
+#
+# Aliases of each family member, as in the R name vectors. Matching is on
+# whole lowercase words, so R's case variants collapse into one entry each,
+# and "Home" is dropped: as a substring it only ever re-matched "Homer", as a
+# word it would count every "home".
+FAMILY_ALIASES = {
+    "Bart": ["bart", "son"],
+    "Lisa": ["lis", "lisa", "sister"],
+    "Marge": ["marge", "mom", "mama", "mother"],
+    "Homer": ["homer", "homie", "dad", "father"],
+    "Maggie": ["maggie"],
+}
+
+DEFAULT_SPEAKERS = ["BART", "LISA", "MARGE", "HOMER"]
+
+# Core family topic in the annotated CSVs
+FAMILY_ANNOTATION = 2
+
+WORD_RE = re.compile(r"[a-z]+")
+
+
+def alias_table(aliases=FAMILY_ALIASES):
+    """Maps every alias word to its target, so one dict lookup per token
+    checks all targets at once."""
+    table = {}
+    for target, words in aliases.items():
+        for word in words:
+            table[word.lower()] = target
+    return table
+
+
+def count_mentions(lines, table):
+    """Counts target mentions over an iterable of dialogue lines. Each line
+    is lowercased and tokenized once."""
+    counts = Counter()
+    for line in lines:
+        for word in WORD_RE.findall(line.lower()):
+            target = table.get(word)
+            if target is not None:
+                counts[target] += 1
+    return counts
+
+
+def mention_matrix(df, speakers=None, aliases=FAMILY_ALIASES):
+    """Speaker x target mention counts as a DataFrame.
+
+    `df` needs character and dialogue columns (the cleaned corpus or the
+    annotated CSVs). speakers=None uses every character in `df`. Speakers
+    mentioning themselves are counted like any other mention.
+    """
+    if speakers is not None:
+        df = df[df["character"].isin(speakers)]
+    table = alias_table(aliases)
+    targets = list(aliases)
+
+    rows = {}
+    for speaker, dialogue in df.groupby("character", observed=True, sort=True)["dialogue"]:
+        counts = count_mentions(dialogue.dropna().astype(str), table)
+        rows[speaker] = [counts[target] for target in targets]
+
+    index = list(speakers) if speakers is not None else sorted(rows)
+    matrix = pd.DataFrame.from_dict(rows, orient="index", columns=targets)
+    matrix = matrix.reindex(index, fill_value=0)
+    matrix.index.name = "speaker"
+    return matrix
+
+
+def load_dialogue(paths, annotation=None):
+    """Reads and combines dialogue CSVs, decoding each like the annotated
+    CSVs (utf-8, else cp1252). With `annotation`, only lines with that
+    annotation are kept; inputs without an annotation column raise a
+    ValueError."""
+    frames = [read_annotated_file(path)[0] for path in paths]
+    if annotation is not None:
+        missing = [os.path.basename(path) for path, frame in zip(paths, frames) if "annotation" not in frame]
+        if missing:
+            raise ValueError(f"no annotation column in {', '.join(missing)}; pass the annotated CSVs as inputs")
+    df = pd.concat(frames, ignore_index=True)
+    if annotation is not None:
+        df = df[df["annotation"] == annotation]
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count how often speakers mention each family member.")
+    parser.add_argument("inputs", nargs="*",
+                        help="dialogue CSVs to read (default: the whole cleaned corpus in --data-dir)")
+    parser.add_argument("--speakers", nargs="+", default=DEFAULT_SPEAKERS, metavar="NAME",
+                        help="speakers to count, as in the character column (default: %(default)s)")
+    parser.add_argument("--all-speakers", action="store_true",
+                        help="count every speaker instead of --speakers")
+    annotation = parser.add_mutually_exclusive_group()
+    annotation.add_argument("--family-only", action="store_const", dest="annotation", const=FAMILY_ANNOTATION,
+                            help=f"only count core-family lines of the annotated CSVs (annotation {FAMILY_ANNOTATION})")
+    annotation.add_argument("--topic", type=int, dest="annotation", metavar="N",
+                            help="only count lines of the annotated CSVs with annotation N")
+    parser.add_argument("--output", help="also write the matrix to this CSV")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="folder holding simpsons_dialogue_cleaned.csv (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    inputs = args.inputs or [os.path.join(args.data_dir, "simpsons_dialogue_cleaned.csv")]
+    try:
+        df = load_dialogue(inputs, args.annotation)
+    except ValueError as e:
+        parser.error(f"--family-only/--topic: {e}")
+    speakers = None if args.all_speakers else [name.upper() for name in args.speakers]
+    matrix = mention_matrix(df, speakers)
+
+    print(matrix.to_string())
+    if args.output:
+        matrix.to_csv(args.output)
+        print(f"Matrix saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
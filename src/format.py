@@ -1,14 +1,25 @@
 import os
 import re
+import argparse
+
+from manifest import bytes_hash, load_manifest, rules_version, save_manifest, stage_entries, update_stage
+from script_io import IO_THREADS, BackgroundWriter, prefetch, read_hashed_text
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "Data")
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+SCRIPTS_FOLDER = os.path.join(DATA_DIR, "raw_scripts")  # data/raw_scripts
+OUTPUT_FOLDER = os.path.join(DATA_DIR, "formatted_scripts")  # data/formatted_scripts
+MANIFEST_PATH = os.path.join(DATA_DIR, "manifest.json")
 
-SCRIPTS_FOLDER = os.path.join(DATA_DIR, "raw_scripts")  # Data/scripts
-OUTPUT_FOLDER = os.path.join(DATA_DIR, "formatted_scripts")  # Data/formatted_scripts
 
-# Create output folder if it doesn't exist
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+def set_data_dir(data_dir):
+    """Points the input/output paths above at another data folder."""
+    global DATA_DIR, SCRIPTS_FOLDER, OUTPUT_FOLDER, MANIFEST_PATH
+    DATA_DIR = data_dir
+    SCRIPTS_FOLDER = os.path.join(DATA_DIR, "raw_scripts")
+    OUTPUT_FOLDER = os.path.join(DATA_DIR, "formatted_scripts")
+    MANIFEST_PATH = os.path.join(DATA_DIR, "manifest.json")
 
 # Detect standalone CHARACTER CUE (all caps)
 CHAR_RE = re.compile(r'^[A-Z][A-Z0-9 \.\'\-]{1,40}$')
@@ -17,10 +28,8 @@ CHAR_RE = re.compile(r'^[A-Z][A-Z0-9 \.\'\-]{1,40}$')
 INLINE_RE = re.compile(r'^([A-Z][A-Z0-9 \.\'\-]{1,40})\s+(.*)$')
 
 
-def format_script_text(text):
-    lines = text.splitlines()
-    formatted = []
-
+def iter_formatted_lines(lines):
+    """Formats script lines one at a time, yielding the output lines."""
     current_character = None
 
     for raw in lines:
@@ -28,7 +37,7 @@ def format_script_text(text):
 
         # Skip pure blank lines → add blank line to output
         if not line:
-            formatted.append("")
+            yield ""
             continue
 
         # CHARACTER + dialogue on same line
@@ -37,14 +46,14 @@ def format_script_text(text):
             name, dialogue = inline.groups()
             if name.isupper() and len(name.split()) <= 4:
                 current_character = name
-                formatted.append(current_character)
-                formatted.append(dialogue.strip())
+                yield current_character
+                yield dialogue.strip()
                 continue
 
         # Standalone character cue
         if CHAR_RE.match(line):
             current_character = line.strip()
-            formatted.append(current_character)
+            yield current_character
             continue
 
         # Dialogue line (parentheticals or spoken text)
@@ -53,35 +62,138 @@ def format_script_text(text):
             line.startswith("(") or         # Parenthetical
             not line[0].isupper()          # Lowercase start = dialogue
         ):
-            formatted.append(line)
+            yield line
             continue
 
         # Otherwise → reset character context & treat as ACTION
         current_character = None
-        formatted.append(line)
+        yield line
+
+
+# Whole-buffer version of iter_formatted_lines. Its output never depends on
+# the character context: every line comes out stripped, and inline cues are
+# split in two. So the buffer is stripped line by line in one C-level pass,
+# and a single scan with this pattern (INLINE_RE on a stripped line) finds the
+# inline cues. Every match starts with the line break before its line: with
+# a literal first character, the regex engine jumps from line break to line
+# break instead of trying every position.
+INLINE_CUE_RE = re.compile(r"\n(?P<name>[A-Z][A-Z0-9 \.\'\-]{1,40})[^\S\n]+(?P<dialogue>.*)")
+
+# Line breaks str.splitlines() knows besides "\n". Texts containing any of
+# them go through the line-by-line formatter instead.
+OTHER_LINE_BREAKS_RE = re.compile(r"[\r\v\f\x1c-\x1e\x85\u2028\u2029]")
+
+
+def format_script_buffer(text):
+    """Same output as the line-by-line formatter, for a text whose only line
+    break is "\n". Text between inline cues is copied through as slices
+    spanning any number of lines."""
+    # splitlines() drops the last line break: "a\n" is one line, not two
+    if text.endswith("\n"):
+        text = text[:-1]
+    # The leading line break lets the first line match too; it is never copied
+    text = "\n" + "\n".join(map(str.strip, text.split("\n")))
+
+    parts = []
+    copied = 1
+    for m in INLINE_CUE_RE.finditer(text):
+        name = m.group("name")
+        if name.isupper() and len(name.split()) <= 4:
+            # Everything up to and including the line break before the cue
+            parts.append(text[copied:m.start() + 1])
+            parts.append(name)
+            parts.append("\n")
+            parts.append(m.group("dialogue"))
+            copied = m.end()
+    parts.append(text[copied:])
+    return "".join(parts)
+
+
+def format_script_text(text):
+    if OTHER_LINE_BREAKS_RE.search(text):
+        return "\n".join(iter_formatted_lines(text.splitlines()))
+    return format_script_buffer(text)
+
+
+def write_lines_through(lines, output_path):
+    """Passes `lines` through unchanged while writing them to `output_path`
+    in the same layout format_script_text produces."""
+    with open(output_path, "w", encoding="utf-8") as f:
+        separator = ""
+        for line in lines:
+            f.write(separator)
+            f.write(line)
+            separator = "\n"
+            yield line
+
+
+# Bump when format_script_text changes in a way the regexes don't show
+FORMAT_LOGIC_VERSION = 1
+FORMAT_VERSION = rules_version(CHAR_RE.pattern, INLINE_RE.pattern, FORMAT_LOGIC_VERSION)
 
-    return "\n".join(formatted)
 
+def process_all_scripts(force=False, io_threads=IO_THREADS):
+    """Formats every raw script whose content changed since the last run.
 
-def process_all_scripts():
+    Upcoming scripts are read and hashed by `io_threads` background threads,
+    and formatted scripts are written in the background, while the current
+    one is being formatted. io_threads=0 does all I/O serially.
+    """
     os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-    for filename in os.listdir(SCRIPTS_FOLDER):
-        if not filename.lower().endswith(".txt"):
-            continue
+    manifest = load_manifest(MANIFEST_PATH)
+    previous = stage_entries(manifest, "format", FORMAT_VERSION, force)
+    entries = {}
+    reformatted = 0
+
+    filenames = [filename for filename in os.listdir(SCRIPTS_FOLDER) if filename.lower().endswith(".txt")]
+    sources = prefetch(
+        [os.path.join(SCRIPTS_FOLDER, filename) for filename in filenames],
+        lambda path: read_hashed_text(path, bytes_hash), io_threads
+    )
+
+    with BackgroundWriter(threads=max(1, io_threads // 2), max_pending=max(1, io_threads)) as writer:
+        for filename, (input_path, (source_hash, text)) in zip(filenames, sources):
+            output_path = os.path.join(OUTPUT_FOLDER, filename)
+
+            entries[filename] = {"source_hash": source_hash}
+
+            # Unchanged since the last run → keep the existing formatted copy
+            if previous.get(filename, {}).get("source_hash") == source_hash and os.path.exists(output_path):
+                continue
+
+            # Newlines as open(..., "r", encoding="utf-8") would translate them
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+            formatted = format_script_text(text)
+
+            if io_threads > 0:
+                writer.write_text(output_path, formatted)
+            else:
+                with open(output_path, "w", encoding="utf-8") as f:
+                    f.write(formatted)
+            reformatted += 1
+
+    update_stage(manifest, "format", FORMAT_VERSION, entries)
+    save_manifest(MANIFEST_PATH, manifest)
 
-        input_path = os.path.join(SCRIPTS_FOLDER, filename)
-        output_path = os.path.join(OUTPUT_FOLDER, filename)
+    print(f"Formatted {reformatted} of {len(entries)} scripts ({len(entries) - reformatted} unchanged)")
 
-        with open(input_path, "r", encoding="utf-8") as f:
-            text = f.read()
 
-        formatted = format_script_text(text)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Unify the layout of the raw script files.")
+    parser.add_argument("--force", action="store_true",
+                        help="reformat every script, ignoring the build manifest")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="folder holding raw_scripts and formatted_scripts (default: %(default)s)")
+    parser.add_argument("--io-threads", type=int, default=IO_THREADS,
+                        help=f"background threads reading and writing scripts, 0 for serial I/O (default: {IO_THREADS})")
+    args = parser.parse_args(argv)
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(formatted)
+    set_data_dir(args.data_dir)
 
+    process_all_scripts(force=args.force, io_threads=args.io_threads)
 
 
 if __name__ == "__main__":
-    process_all_scripts()
+    main()
@@ -1,40 +1,110 @@
+import os
+import argparse
+
+import matplotlib
+matplotlib.use("Agg")  # batch rendering only, never opens a window
 import matplotlib.pyplot as plt
 import numpy as np
 
-# Data from the R output image
+from annotated_data import DATA_DIR, load_data
+from chart_files import safe_filename
+
 topics = [1, 2, 3, 4, 5, 6, 7, 8]
 topic_labels = [
-    "Themselves", 
-    "Core Family", 
-    "Non-Core Family", 
-    "Location", 
-    "Object", 
-    "Event", 
-    "Emotion", 
+    "Themselves",
+    "Core Family",
+    "Non-Core Family",
+    "Location",
+    "Object",
+    "Event",
+    "Emotion",
     "Opinion"
 ]
 
-bart_counts = [33, 48, 83, 14, 39, 12, 18, 53]
-lisa_counts = [9, 87, 58, 8, 40, 6, 24, 68]
-marge_counts = [5, 97, 38, 14, 27, 10, 35, 74]
+def topic_counts(df, by=("character",)):
+    """Line counts per topic for every group of `by`, in one groupby.
+
+    Returns a DataFrame indexed by the `by` keys, with one column per topic
+    (missing topics are 0).
+    """
+    counts = df.groupby(list(by) + ["annotation"], observed=True).size()
+    return counts.unstack("annotation", fill_value=0).reindex(columns=topics, fill_value=0)
+
+def draw_topic_bars(ax, counts, title):
+    """Grouped bar chart: one bar series per row of `counts`."""
+    x = np.arange(len(topics))  # the label locations
+    width = 0.75 / max(len(counts), 1)  # the width of the bars
+    offsets = (np.arange(len(counts)) - (len(counts) - 1) / 2) * width
+
+    for offset, (name, row) in zip(offsets, counts.iterrows()):
+        ax.bar(x + offset, row.to_numpy(), width, label=str(name).title())
+
+    # Add some text for labels, title and custom x-axis tick labels, etc.
+    ax.set_ylabel('Line Counts')
+    ax.set_title(title)
+    ax.set_xticks(x)
+    ax.set_xticklabels(topic_labels, rotation=45, ha="right")
+    ax.legend()
+
+def render_charts(charts, dpi=300):
+    """Renders (output path, title, counts) charts, reusing one figure.
+
+    Clearing and redrawing a single Axes is much cheaper than creating a
+    figure per chart, and keeps memory flat over long batches.
+    """
+    fig, ax = plt.subplots(figsize=(12, 6))
+    try:
+        for output_path, title, counts in charts:
+            ax.clear()
+            draw_topic_bars(ax, counts, title)
+            fig.tight_layout()
+            fig.savefig(output_path, dpi=dpi)
+            print(f"Chart saved to {output_path}")
+    finally:
+        plt.close(fig)
+
+def episode_charts(df, out_dir):
+    """One chart per episode: topic counts of every character in it."""
+    counts = topic_counts(df, by=("episode", "character"))
+    for episode, episode_counts in counts.groupby(level="episode", observed=True):
+        yield (os.path.join(out_dir, f"episode_{safe_filename(episode)}.png"),
+               f"Topic Distribution in {episode}",
+               episode_counts.droplevel("episode"))
+
+def character_charts(df, out_dir):
+    """One chart per character: their topic counts."""
+    counts = topic_counts(df)
+    for character in counts.index:
+        yield (os.path.join(out_dir, f"character_{safe_filename(character)}.png"),
+               f"Topic Distribution for {str(character).title()}",
+               counts.loc[[character]])
 
-x = np.arange(len(topics))  # the label locations
-width = 0.25  # the width of the bars
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Topic distribution charts from the annotated dialogue.")
+    parser.add_argument("--output", default="topic_distribution.png",
+                        help="path of the overall chart (default: %(default)s)")
+    parser.add_argument("--per-episode", action="store_true",
+                        help="also render one chart per episode into --out-dir")
+    parser.add_argument("--per-character", action="store_true",
+                        help="also render one chart per character into --out-dir")
+    parser.add_argument("--out-dir", default="charts",
+                        help="folder for per-episode/per-character charts (default: %(default)s)")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="folder holding the *_annotated_dialogue.csv files (default: %(default)s)")
+    args = parser.parse_args(argv)
 
-fig, ax = plt.subplots(figsize=(12, 6))
-rects1 = ax.bar(x - width, bart_counts, width, label='Bart')
-rects2 = ax.bar(x, lisa_counts, width, label='Lisa')
-rects3 = ax.bar(x + width, marge_counts, width, label='Marge')
+    df = load_data(args.data_dir)
 
-# Add some text for labels, title and custom x-axis tick labels, etc.
-ax.set_ylabel('Line Counts')
-ax.set_title('Topic Distribution by Character')
-ax.set_xticks(x)
-ax.set_xticklabels(topic_labels, rotation=45, ha="right")
-ax.legend()
+    charts = [(args.output, 'Topic Distribution by Character', topic_counts(df))]
+    if args.per_episode or args.per_character:
+        os.makedirs(args.out_dir, exist_ok=True)
+    if args.per_episode:
+        charts.extend(episode_charts(df, args.out_dir))
+    if args.per_character:
+        charts.extend(character_charts(df, args.out_dir))
 
-fig.tight_layout()
+    render_charts(charts, args.dpi)
 
-output_path = "topic_distribution.png"
-plt.savefig(output_path, dpi=300)
-print(f"Chart saved to {output_path}")
+if __name__ == "__main__":
+    main()
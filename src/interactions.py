@@ -0,0 +1,160 @@
+import os
+import argparse
+
+import numpy as np
+import scipy.sparse as sp
+
+# Who talks to whom, as character x character sparse matrices over integer
+# character IDs, built in one pass over the extracted rows in script order:
+#
+#   turns[a, b]       times a line by b directly follows a line by a in the
+#                     same scene (a != b)
+#   copresence[a, b]  scenes in which both a and b speak; the diagonal holds
+#                     the number of scenes each character speaks in
+#
+# extract.py --interactions streams every row through count_rows_through(),
+# including those of characters too rare for the cleaned CSV, and saves
+# data/interactions.npz; load_interactions() reads it back.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+INTERACTIONS_FILE = "interactions.npz"
+
+# Pairs collected before they are folded into the sparse totals
+FLUSH_PAIRS = 1 << 20
+
+
+class InteractionCounter:
+    """Accumulates speaker turns and scene co-presence one row at a time.
+
+    `characters` fixes the ID of every name (its index); names not in it are
+    appended as they appear.
+    """
+
+    def __init__(self, characters=()):
+        self.characters = list(characters)
+        self.character_ids = {name: i for i, name in enumerate(self.characters)}
+        self.turns = sp.csr_matrix((0, 0), dtype=np.int64)
+        self.copresence = sp.csr_matrix((0, 0), dtype=np.int64)
+        self._turn_pairs = []
+        self._copresence_pairs = []
+        self._scene = None
+        self._speakers = set()
+        self._previous = None
+
+    def _character_id(self, name):
+        character_id = self.character_ids.get(name)
+        if character_id is None:
+            character_id = self.character_ids[name] = len(self.characters)
+            self.characters.append(name)
+        return character_id
+
+    def _end_scene(self):
+        for a in self._speakers:
+            self._copresence_pairs.extend((a, b) for b in self._speakers)
+        self._speakers = set()
+        self._previous = None
+        if len(self._turn_pairs) + len(self._copresence_pairs) >= FLUSH_PAIRS:
+            self._flush()
+
+    def _fold(self, total, pairs):
+        size = len(self.characters)
+        if pairs:
+            rows, cols = zip(*pairs)
+            new = sp.csr_matrix((np.ones(len(pairs), dtype=np.int64), (rows, cols)), shape=(size, size))
+        else:
+            new = sp.csr_matrix((size, size), dtype=np.int64)
+        total = sp.csr_matrix((total.data, total.indices, total.indptr), shape=total.shape)
+        total.resize((size, size))
+        return (total + new).tocsr()
+
+    def _flush(self):
+        self.turns = self._fold(self.turns, self._turn_pairs)
+        self.copresence = self._fold(self.copresence, self._copresence_pairs)
+        self._turn_pairs = []
+        self._copresence_pairs = []
+
+    def add(self, character, episode, scene):
+        """Counts one line. Lines must come in script order, episode by episode."""
+        if (episode, scene) != self._scene:
+            self._end_scene()
+            self._scene = (episode, scene)
+        speaker = self._character_id(character)
+        if self._previous is not None and self._previous != speaker:
+            self._turn_pairs.append((self._previous, speaker))
+        self._previous = speaker
+        self._speakers.add(speaker)
+
+    def finish(self):
+        """Closes the last scene. Returns (characters, turns, copresence)."""
+        self._end_scene()
+        self._scene = None
+        self._flush()
+        return self.characters, self.turns, self.copresence
+
+
+def save_interactions(path, characters, turns, copresence):
+    tmp_path = path[:-len(".npz")] + ".tmp.npz"
+    arrays = {"characters": np.array(characters, dtype=str)}
+    for name, matrix in (("turns", turns), ("copresence", copresence)):
+        arrays[f"{name}_data"] = matrix.data
+        arrays[f"{name}_indices"] = matrix.indices
+        arrays[f"{name}_indptr"] = matrix.indptr
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_interactions(path):
+    """(characters, turns, copresence) as saved by save_interactions."""
+    with np.load(path) as data:
+        characters = data["characters"].tolist()
+        size = len(characters)
+        turns, copresence = (
+            sp.csr_matrix((data[f"{name}_data"], data[f"{name}_indices"], data[f"{name}_indptr"]),
+                          shape=(size, size))
+            for name in ("turns", "copresence")
+        )
+    return characters, turns, copresence
+
+
+def count_rows_through(rows, path, characters=()):
+    """Passes (character, dialogue, episode, line, scene) rows through
+    unchanged while counting them, then saves the matrices to `path`."""
+    counter = InteractionCounter(characters)
+    for row in rows:
+        counter.add(row[0], row[2], row[4])
+        yield row
+    save_interactions(path, *counter.finish())
+
+
+def top_pairs(matrix, characters, n=20, symmetric=False):
+    """The n largest off-diagonal entries as (count, a, b), largest first.
+    With symmetric=True, each pair is only listed once."""
+    coo = sp.triu(matrix, k=1).tocoo() if symmetric else matrix.tocoo()
+    keep = coo.row != coo.col
+    rows, cols, counts = coo.row[keep], coo.col[keep], coo.data[keep]
+    order = np.lexsort((cols, rows, -counts))[:n]
+    return [(int(counts[i]), characters[rows[i]], characters[cols[i]]) for i in order]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Most frequent speaker turns and scene co-presences.")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help=f"folder holding {INTERACTIONS_FILE}, written by extract.py --interactions "
+                             "(default: %(default)s)")
+    parser.add_argument("--top", type=int, default=20, help="pairs to print (default: 20)")
+    args = parser.parse_args(argv)
+
+    characters, turns, copresence = load_interactions(os.path.join(args.data_dir, INTERACTIONS_FILE))
+    print(f"{len(characters)} characters, {turns.sum()} speaker turns")
+    print("\nSpeaker turns (first -> next):")
+    for count, a, b in top_pairs(turns, characters, args.top):
+        print(f"  {count:6d}  {a} -> {b}")
+    print("\nScenes together:")
+    for count, a, b in top_pairs(copresence, characters, args.top, symmetric=True):
+        print(f"  {count:6d}  {a} & {b}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import json
+import hashlib
+
+# Build manifest shared by format.py and extract.py. It lives next to
+# formatted_scripts and holds one section per stage:
+#   {"format":  {"version": ..., "files": {filename: {...}}},
+#    "extract": {"version": ..., "files": {filename: {...}}}}
+
+
+def file_hash(path):
+    """SHA-256 of a file's bytes."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def bytes_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def rules_version(*tables):
+    """Hashes pattern tables / mappings so a rule change invalidates the cache."""
+    encoded = json.dumps(tables, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    # Write to a temp file first so an interrupted run never leaves a
+    # half-written manifest behind
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def stage_entries(manifest, stage, version, force=False):
+    """Returns the per-file entries recorded for `stage`, or {} if they are
+    stale (different version) or a full rebuild was requested."""
+    section = manifest.get(stage, {})
+    if force or section.get("version") != version:
+        return {}
+    return section.get("files", {})
+
+
+def update_stage(manifest, stage, version, files):
+    manifest[stage] = {"version": version, "files": files}
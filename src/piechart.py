@@ -1,37 +1,117 @@
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # headless: charts are only ever saved, never shown
 import matplotlib.pyplot as plt
+import argparse
 import os
 
-# Construct path to CSV
-csv_path = os.path.join("..", "data", "character_line_counts.csv")
-
-# Load the CSV
-df = pd.read_csv(csv_path)
-
-# Exclude Homer Simpson
-df_side_chars = df[df['character'].str.upper() != 'HOMER']
-df_top15 = df_side_chars.nlargest(15, 'dialogue_blocks')
-
-
-# Function to display actual number on pie slices
-def make_autopct(values):
-    def my_autopct(pct):
-        total = sum(values)
-        index = values.index(int(round(pct * total / 100.0)))
-        return f'{values[index]}'
-    return my_autopct
-
-# Plot pie chart
-plt.figure(figsize=(8, 8))
-plt.pie(
-    df_top15['dialogue_blocks'],
-    labels=df_top15['character'],
-    autopct=lambda pct: str(int(round(pct * sum(df_top15['dialogue_blocks']) / 100))),
-    startangle=140
-)
-plt.title("Top 15 Side Character Dialogue Counts")
-plt.tight_layout()
-
-# Save PNG
-plt.savefig(os.path.join("..", "data", "side_character_dialogue_count.png"))
-plt.show()
+from chart_files import safe_filename
+
+# Paths default to the repo's data folder, wherever the script is run from
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+COUNTS_CSV = os.path.join(DATA_DIR, "character_line_counts.csv")
+DIALOGUE_CSV = os.path.join(DATA_DIR, "simpsons_dialogue_cleaned.csv")
+OUTPUT_PNG = os.path.join(DATA_DIR, "side_character_dialogue_count.png")
+
+# Seasons by production code prefix (the episode column starts with the
+# production code, e.g. "7G03"). A few episodes aired a season later than
+# their production run, so slicing by this is approximate.
+PRODUCTION_SEASONS = {
+    "7G": 1, "7F": 2, "8F": 3, "9F": 4, "1F": 5,
+    "2F": 6, "3F": 7, "4F": 8, "5F": 9, "AABF": 10,
+}
+
+def top_side_characters(counts, top_n=15, exclude=("HOMER",)):
+    """Top N rows of a character/dialogue_blocks table, without `exclude`."""
+    # Exclude Homer Simpson
+    side_chars = counts[~counts['character'].str.upper().isin([name.upper() for name in exclude])]
+    return side_chars.nlargest(top_n, 'dialogue_blocks')
+
+def draw_pie(ax, top, title):
+    values = top['dialogue_blocks'].to_numpy()
+    total = values.sum()
+    ax.pie(
+        values,
+        labels=top['character'],
+        # Display the actual number on pie slices
+        autopct=lambda pct: str(int(round(pct * total / 100))),
+        startangle=140
+    )
+    ax.set_title(title)
+
+def pie_chart_report(counts_csv=COUNTS_CSV, output_path=OUTPUT_PNG, top_n=15, exclude=("HOMER",)):
+    """Saves the top-N side character pie chart of a line counts CSV."""
+    counts = pd.read_csv(counts_csv)
+    fig, ax = plt.subplots(figsize=(8, 8))
+    try:
+        draw_pie(ax, top_side_characters(counts, top_n, exclude), f"Top {top_n} Side Character Dialogue Counts")
+        fig.tight_layout()
+        fig.savefig(output_path)
+    finally:
+        plt.close(fig)
+    print(f"Chart saved to {output_path}")
+    return output_path
+
+def season_of(episode):
+    code = str(episode).split()[0] if str(episode).split() else ""
+    season = PRODUCTION_SEASONS.get(code.rstrip("0123456789"))
+    return f"season {season}" if season is not None else "other"
+
+def slice_counts(dialogue, by="episode"):
+    """Dialogue blocks per (slice, character) of the cleaned dialogue CSV,
+    counted in one groupby. `by` is "episode" or "season"."""
+    keys = dialogue['episode'] if by == "episode" else dialogue['episode'].map(season_of)
+    counts = dialogue.groupby([keys.rename("slice"), "character"]).size()
+    return counts.rename('dialogue_blocks').reset_index()
+
+def slice_pie_charts(dialogue_csv=DIALOGUE_CSV, out_dir=DATA_DIR, by="episode", top_n=15, exclude=("HOMER",)):
+    """Saves one top-N pie chart per episode or season, in one pass.
+
+    The CSV is read once and every chart is drawn on the same reused figure.
+    Returns the paths written.
+    """
+    counts = slice_counts(pd.read_csv(dialogue_csv), by)
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    fig, ax = plt.subplots(figsize=(8, 8))
+    try:
+        for name, group in counts.groupby('slice', sort=True):
+            ax.clear()
+            draw_pie(ax, top_side_characters(group, top_n, exclude), f"Top {top_n} Dialogue Counts: {name}")
+            fig.tight_layout()
+            output_path = os.path.join(out_dir, f"pie_{safe_filename(name)}.png")
+            fig.savefig(output_path)
+            written.append(output_path)
+    finally:
+        plt.close(fig)
+    print(f"Saved {len(written)} charts to {out_dir}")
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pie charts of the most talkative side characters.")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="folder the default input/output paths are in (default: %(default)s)")
+    parser.add_argument("--input", help="character line counts CSV (default: character_line_counts.csv)")
+    parser.add_argument("--output", help="output PNG (default: side_character_dialogue_count.png)")
+    parser.add_argument("--top", type=int, default=15, help="number of characters per chart (default: 15)")
+    parser.add_argument("--exclude", nargs="*", default=["HOMER"], metavar="NAME",
+                        help="characters left out of the charts (default: HOMER)")
+    parser.add_argument("--by", choices=["episode", "season"],
+                        help="instead, render one chart per episode or season from --dialogue")
+    parser.add_argument("--dialogue", help="cleaned dialogue CSV used with --by (default: simpsons_dialogue_cleaned.csv)")
+    parser.add_argument("--out-dir", help="output folder used with --by (default: pie_charts)")
+    args = parser.parse_args(argv)
+
+    def in_data_dir(path, default):
+        return path or os.path.join(args.data_dir, default)
+
+    if args.by:
+        slice_pie_charts(in_data_dir(args.dialogue, "simpsons_dialogue_cleaned.csv"),
+                         in_data_dir(args.out_dir, "pie_charts"), args.by, args.top, args.exclude)
+    else:
+        pie_chart_report(in_data_dir(args.input, "character_line_counts.csv"),
+                         in_data_dir(args.output, "side_character_dialogue_count.png"), args.top, args.exclude)
+
+if __name__ == "__main__":
+    main()
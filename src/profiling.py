@@ -0,0 +1,68 @@
+import json
+from collections import Counter, defaultdict
+
+# Counters behind extract.py --profile. One RunStats is filled per parsed
+# script (in whichever process parsed it), sent back as a plain dict and
+# merged into the run's totals.
+
+
+class RunStats:
+    def __init__(self):
+        self.rule_hits = defaultdict(Counter)  # rule table -> rule -> hits
+        self.dropped = Counter()  # reason -> dialogue blocks
+        self.files = []  # per-file timings
+        self.stages = Counter()  # run stage -> seconds
+
+    def hit(self, table, rule):
+        self.rule_hits[table][rule] += 1
+
+    def drop(self, reason):
+        self.dropped[reason] += 1
+
+    def to_dict(self):
+        return {
+            "rule_hits": {table: dict(hits) for table, hits in self.rule_hits.items()},
+            "dropped": dict(self.dropped),
+            "files": self.files,
+            "stages": dict(self.stages),
+        }
+
+    def merge(self, data):
+        """Adds the counters of another RunStats, given as to_dict() output."""
+        for table, hits in data["rule_hits"].items():
+            self.rule_hits[table].update(hits)
+        self.dropped.update(data["dropped"])
+        self.files.extend(data["files"])
+        self.stages.update(data["stages"])
+
+    def report(self, rule_tables):
+        """JSON-ready report. Every rule of `rule_tables` (name -> patterns)
+        is listed, so rules that never fired show up with 0 hits."""
+        rules = {}
+        for table, patterns in rule_tables.items():
+            hits = self.rule_hits.get(table, Counter())
+            rules[table] = sorted(
+                ({"rule": pat, "hits": hits[pat]} for pat in patterns),
+                key=lambda r: -r["hits"]
+            )
+        for table, hits in self.rule_hits.items():
+            if table not in rule_tables:
+                rules[table] = [{"rule": rule, "hits": n} for rule, n in hits.most_common()]
+
+        return {
+            "stages": {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+            "files_parsed": len(self.files),
+            "parse_seconds": round(sum(f["seconds"] for f in self.files), 6),
+            "dropped_blocks": dict(self.dropped.most_common()),
+            "rules": rules,
+            "dead_rules": {
+                table: [r["rule"] for r in table_rules if r["hits"] == 0]
+                for table, table_rules in rules.items()
+            },
+            "files": sorted(self.files, key=lambda f: -f["seconds"]),
+        }
+
+
+def write_report(path, report):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
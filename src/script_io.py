@@ -0,0 +1,121 @@
+import io
+import os
+import mmap
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Script file I/O shared by format.py and extract.py: reads of upcoming
+# scripts and writes of finished ones run in a few threads, overlapping with
+# the parsing of the current script. On slow shared storage the serial
+# open/read/write round-trips would otherwise dominate. Both directions are
+# bounded, so at most a few scripts are held in memory at a time.
+
+# Files at least this big are decoded straight from a memory map, without
+# first copying their bytes into a bytes object
+MMAP_THRESHOLD = 1 << 20
+
+# Default number of reads kept in flight ahead of the consumer
+IO_THREADS = 4
+
+
+def _read(f, mmap_threshold, decode):
+    size = os.fstat(f.fileno()).st_size
+    if size and size >= mmap_threshold:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return decode(mm)
+    return decode(f.read())
+
+
+def read_hashed_text(path, hash_bytes, errors="strict", mmap_threshold=MMAP_THRESHOLD):
+    """(hash_bytes(data), text) of a UTF-8 file, undecoded newlines
+    included, from a single read."""
+    with open(path, "rb") as f:
+        return _read(f, mmap_threshold, lambda data: (hash_bytes(data), str(data, "utf-8", errors)))
+
+
+def text_lines(text):
+    """Iterates over `text` the way iterating over a file opened in text
+    mode does: universal newlines, each line ending in "\\n"."""
+    return io.StringIO(text, newline=None)
+
+
+def prefetch(paths, load, depth=IO_THREADS):
+    """Yields (path, load(path)) for every path, in order.
+
+    Up to `depth` loads run ahead in a thread pool while the caller works on
+    the current result, so memory is bounded by `depth` loaded files.
+    depth=0 loads serially in the calling thread. Errors are raised when the
+    failing path's turn comes.
+    """
+    if depth <= 0:
+        for path in paths:
+            yield path, load(path)
+        return
+
+    paths = iter(paths)
+    pool = ThreadPoolExecutor(max_workers=depth)
+    try:
+        pending = deque()
+        for path in paths:
+            pending.append((path, pool.submit(load, path)))
+            if len(pending) >= depth:
+                break
+        while pending:
+            path, future = pending.popleft()
+            # Start the next read before handing this one out
+            for next_path in paths:
+                pending.append((next_path, pool.submit(load, next_path)))
+                break
+            yield path, future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class BackgroundWriter:
+    """Writes files in background threads, keeping at most `max_pending`
+    writes (and their contents) queued. Use as a context manager: leaving it
+    waits for every write and re-raises the first write error."""
+
+    def __init__(self, threads=2, max_pending=8):
+        self._pool = ThreadPoolExecutor(max_workers=threads)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._futures = []
+
+    def _write_text(self, path, text, encoding):
+        try:
+            with open(path, "w", encoding=encoding) as f:
+                f.write(text)
+        finally:
+            self._slots.release()
+
+    def _raise_errors(self, wait=False):
+        futures, self._futures = self._futures, []
+        for future in futures:
+            if wait or future.done():
+                future.result()
+            else:
+                self._futures.append(future)
+
+    def write_text(self, path, text, encoding="utf-8"):
+        """Queues a write equivalent to open(path, "w", encoding=encoding).write(text)."""
+        self._raise_errors()
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(self._write_text, path, text, encoding)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._futures.append(future)
+
+    def close(self):
+        try:
+            self._raise_errors(wait=True)
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,148 @@
+import os
+import json
+import shutil
+
+import numpy as np
+import scipy.sparse as sp
+
+from manifest import file_hash, rules_version
+
+# Disk cache for analyze_topics.py. One entry per (input files, vectorizer
+# parameters), keyed on their hashes:
+#
+#   tfidf_cache/<key>/
+#     vocabulary.json         feature names, parameters, input file hashes
+#     line_terms.npz          lines x terms count matrix
+#     group-<by>.npz / .json  TF-IDF matrix, IDF vector and labels per grouping
+#
+# Entries are evicted least-recently-used first once the cache grows past
+# its size limit.
+
+# Bump when the cached data would be computed differently
+CACHE_VERSION = 1
+
+
+def cache_key(paths, params):
+    inputs = sorted((os.path.basename(p), file_hash(p)) for p in paths)
+    return rules_version(inputs, params, CACHE_VERSION)
+
+
+def entry_path(cache_dir, key):
+    return os.path.join(cache_dir, key)
+
+
+def _replace_npz(path, save):
+    # np.savez appends ".npz" to names that lack it, so keep the suffix
+    tmp_path = path[:-len(".npz")] + ".tmp.npz"
+    save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def load_line_terms(entry):
+    try:
+        with open(os.path.join(entry, "vocabulary.json"), "r", encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        counts = sp.load_npz(os.path.join(entry, "line_terms.npz")).tocsr()
+    except (OSError, ValueError, KeyError):
+        return None
+    return counts, np.array(vocabulary["features"], dtype=object)
+
+
+def save_line_terms(entry, line_terms, params, paths):
+    counts, feature_names = line_terms
+    os.makedirs(entry, exist_ok=True)
+    _replace_npz(os.path.join(entry, "line_terms.npz"), lambda p: sp.save_npz(p, counts.tocsr()))
+    # vocabulary.json goes last: an entry only counts once it exists
+    _write_json(os.path.join(entry, "vocabulary.json"), {
+        "features": [str(f) for f in feature_names],
+        "params": params,
+        "inputs": [os.path.basename(p) for p in paths],
+    })
+
+
+def grouping_name(by):
+    return "+".join(by) if isinstance(by, (list, tuple)) else str(by)
+
+
+def _label_to_json(label):
+    if isinstance(label, tuple):
+        return [_label_to_json(part) for part in label]
+    return label.item() if hasattr(label, "item") else label
+
+
+def _label_from_json(label):
+    return tuple(label) if isinstance(label, list) else label
+
+
+def load_grouping(entry, by):
+    """Returns the cached (labels, tfidf matrix, idf) for a grouping, or None."""
+    base = os.path.join(entry, "group-" + grouping_name(by))
+    try:
+        with open(base + ".json", "r", encoding="utf-8") as f:
+            labels = [_label_from_json(label) for label in json.load(f)["labels"]]
+        with np.load(base + ".npz") as arrays:
+            tfidf_matrix = sp.csr_matrix(
+                (arrays["data"], arrays["indices"], arrays["indptr"]), shape=tuple(arrays["shape"])
+            )
+            idf = arrays["idf"]
+    except (OSError, ValueError, KeyError):
+        return None
+    return labels, tfidf_matrix, idf
+
+
+def save_grouping(entry, by, labels, tfidf_matrix, idf):
+    base = os.path.join(entry, "group-" + grouping_name(by))
+    tfidf_matrix = tfidf_matrix.tocsr()
+    os.makedirs(entry, exist_ok=True)
+    _replace_npz(base + ".npz", lambda p: np.savez(
+        p, data=tfidf_matrix.data, indices=tfidf_matrix.indices,
+        indptr=tfidf_matrix.indptr, shape=np.array(tfidf_matrix.shape), idf=idf,
+    ))
+    _write_json(base + ".json", {"labels": [_label_to_json(label) for label in labels]})
+
+
+def touch(entry):
+    """Marks an entry as just used, for LRU eviction."""
+    if os.path.isdir(entry):
+        os.utime(entry)
+
+
+def _entry_size(entry):
+    return sum(
+        os.path.getsize(os.path.join(entry, name))
+        for name in os.listdir(entry)
+        if os.path.isfile(os.path.join(entry, name))
+    )
+
+
+def evict(cache_dir, max_bytes, keep=None):
+    """Deletes least-recently-used entries until the cache fits in max_bytes.
+
+    The entry named `keep` (the one in use) is never deleted.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        if os.path.isdir(entry):
+            entries.append((os.path.getmtime(entry), name, _entry_size(entry)))
+
+    total = sum(size for _, _, size in entries)
+    evicted = []
+    for _, name, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if name == keep:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        total -= size
+        evicted.append(name)
+    return evicted
@@ -0,0 +1,258 @@
+import os
+import json
+import shutil
+import argparse
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.utils import murmurhash3_32
+
+from analyze_topics import TFIDF_PARAMS, clean_text_column, print_top_words, token_analyzer, top_words_from_matrix
+from annotated_data import DATA_DIR, annotated_files, read_annotated_file
+from manifest import bytes_hash
+
+# Incremental term statistics per topic (or any other grouping column), so
+# new annotated lines are counted once instead of refitting everything:
+#
+#   topic_stats/
+#     state.json    parameters, group labels, vocabulary (or the term first
+#                   seen in each hashed column), lines counted per input file
+#     counts.npz    groups x terms term counts
+#
+# update_from_files() only tokenizes the rows past those already counted in
+# each *_annotated_dialogue.csv, up to the first line not annotated yet.
+# top_words() answers from the counts: with the full vocabulary and
+# max_features=1000 it gives the same scores as
+# analyze_topics.compute_tfidf_top_words over the same rows.
+#
+# With n_features set, terms are hashed into that many columns instead of
+# being added to a vocabulary, so memory stays bounded however many distinct
+# words arrive (colliding terms share a column).
+
+STATS_DIR = "topic_stats"
+
+# Bump when the stored statistics would be computed differently
+STATS_VERSION = 2
+
+
+def rows_digest(df, columns):
+    """Hash of the given columns of `df`'s rows, to notice edits to rows
+    that were already counted. Numbers are compared as floats: a column
+    of integers reads as floats while a later row is still empty."""
+    frame = df[columns].apply(
+        lambda column: column.astype("float64") if pd.api.types.is_numeric_dtype(column) else column.astype(str)
+    )
+    hashes = pd.util.hash_pandas_object(frame, index=False)
+    return bytes_hash(hashes.to_numpy().tobytes())
+
+
+class TopicStats:
+    """Term counts per group of lines, updated one batch of rows at a time."""
+
+    def __init__(self, by="annotation", n_features=None):
+        self.by = by
+        self.n_features = n_features
+        self.labels = []
+        self.label_ids = {}
+        # Vocabulary mode: terms[column]. Hashing mode: column -> first term seen
+        self.terms = {} if n_features else []
+        self.term_ids = {}
+        self.counts = sp.csr_matrix((0, n_features or 0), dtype=np.int64)
+        self.n_lines = 0
+        self.files = {}  # file name -> {"rows": lines counted, "digest": rows_digest of them}
+
+    def _term_columns(self, batch_terms):
+        if self.n_features:
+            columns = np.array([murmurhash3_32(term, positive=True) % self.n_features for term in batch_terms],
+                               dtype=np.int64)
+            for term, column in zip(batch_terms, columns.tolist()):
+                self.terms.setdefault(column, term)
+            return columns
+        for term in batch_terms:
+            if term not in self.term_ids:
+                self.term_ids[term] = len(self.terms)
+                self.terms.append(term)
+        return np.array([self.term_ids[term] for term in batch_terms], dtype=np.int64)
+
+    def _label_rows(self, keys):
+        # An integer column reads as floats while some row is still empty
+        keys = [int(key) if isinstance(key, float) and key.is_integer() else key for key in keys]
+        for label in keys:
+            if label not in self.label_ids:
+                self.label_ids[label] = len(self.labels)
+                self.labels.append(label)
+        return np.array([self.label_ids[label] for label in keys], dtype=np.int64)
+
+    def update(self, df):
+        """Adds the lines of `df` (dialogue and the grouping column) to the
+        counts. Lines without a group key are skipped. Returns the number of
+        lines counted."""
+        df = df[df[self.by].notna()]
+        if not len(df):
+            return 0
+        tokens = clean_text_column(df["dialogue"].astype(str), tokens=True)
+        vectorizer = CountVectorizer(analyzer=token_analyzer(), dtype=np.int64)
+        try:
+            batch = vectorizer.fit_transform(tokens).tocsr()
+        except ValueError:  # no terms left at all, e.g. only stop words
+            self.n_lines += len(df)
+            return len(df)
+
+        # Batch columns -> store columns (new terms are appended); hashed
+        # columns can collide, so duplicates are summed
+        columns = self._term_columns(vectorizer.get_feature_names_out().tolist())
+        width = self.n_features or len(self.terms)
+        batch = sp.csr_matrix((batch.data, columns[batch.indices], batch.indptr), shape=(batch.shape[0], width))
+        batch.sum_duplicates()
+
+        groups = self._label_rows(df[self.by].tolist())
+        indicator = sp.csr_matrix(
+            (np.ones(len(groups), dtype=np.int64), (groups, np.arange(len(groups)))),
+            shape=(len(self.labels), len(groups))
+        )
+        counts = self.counts
+        counts = sp.csr_matrix((counts.data, counts.indices, counts.indptr), shape=counts.shape)
+        counts.resize((len(self.labels), width))
+        self.counts = (counts + indicator @ batch).tocsr()
+        self.n_lines += len(df)
+        return len(df)
+
+    def update_from_files(self, paths):
+        """Counts the rows of each annotated CSV that weren't counted yet.
+
+        Files only ever grow at the end: rows already counted must be
+        unchanged, otherwise a ValueError asks for a rebuild. Counting stops
+        at a file's first line without a group key, so a line annotated later
+        is picked up by a later update. Returns the number of lines counted
+        per file name.
+        """
+        added = {}
+        for path in paths:
+            name = os.path.basename(path)
+            df, _ = read_annotated_file(path)
+            seen = self.files.get(name, {"rows": 0, "digest": None})
+            columns = ["dialogue", self.by]
+            if len(df) < seen["rows"] or (
+                    seen["rows"] and rows_digest(df.iloc[:seen["rows"]], columns) != seen["digest"]):
+                raise ValueError(f"{name} changed in rows that were already counted; rebuild the statistics")
+            new_rows = df.iloc[seen["rows"]:]
+            missing = np.flatnonzero(new_rows[self.by].isna().to_numpy())
+            if len(missing):
+                new_rows = new_rows.iloc[:missing[0]]
+            if len(new_rows):
+                self.update(new_rows)
+                counted = seen["rows"] + len(new_rows)
+                self.files[name] = {"rows": counted, "digest": rows_digest(df.iloc[:counted], columns)}
+            added[name] = len(new_rows)
+        return added
+
+    def term_names(self):
+        if self.n_features:
+            return np.array([self.terms.get(column, "") for column in range(self.n_features)], dtype=object)
+        return np.array(self.terms, dtype=object)
+
+    def top_words(self, k=10, max_features=TFIDF_PARAMS["max_features"]):
+        """Top k TF-IDF terms of every group, treating each group's lines as
+        one document, from the stored counts. `max_features` keeps only the
+        most frequent terms overall, like the vectorizer setting."""
+        names = self.term_names()
+        counts = self.counts.tocsc()
+        # Alphabetical, like a vectorizer's features, so ties rank the same
+        # way. Hashed: only the columns some term went into, by first term
+        columns = np.flatnonzero(np.diff(counts.indptr)) if self.n_features else np.arange(len(names))
+        columns = columns[np.argsort(names[columns], kind="stable")]
+        counts = counts[:, columns]
+        names = names[columns]
+
+        if max_features is not None and counts.shape[1] > max_features:
+            totals = np.asarray(counts.sum(axis=0)).ravel()
+            keep = np.sort((-totals).argsort()[:max_features])
+            counts = counts[:, keep]
+            names = names[keep]
+
+        order = sorted(range(len(self.labels)), key=lambda i: self.labels[i])
+        tfidf_matrix = TfidfTransformer().fit_transform(counts.tocsr()[order])
+        return top_words_from_matrix([self.labels[i] for i in order], tfidf_matrix, names, k)
+
+    def save(self, path):
+        """Writes the store to `path`, through a temporary folder swapped in
+        once complete, so counts and the rows they cover never disagree."""
+        tmp_dir = path + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        sp.save_npz(os.path.join(tmp_dir, "counts.npz"), self.counts)
+        with open(os.path.join(tmp_dir, "state.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "version": STATS_VERSION,
+                "by": self.by,
+                "n_features": self.n_features,
+                "labels": self.labels,
+                "terms": list(self.terms.items()) if self.n_features else self.terms,
+                "n_lines": self.n_lines,
+                "files": self.files,
+            }, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_dir, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "state.json"), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") != STATS_VERSION:
+            raise ValueError(f"{path} was written by a different version; rebuild it")
+        stats = cls(state["by"], state["n_features"])
+        stats.labels = state["labels"]
+        stats.label_ids = {label: i for i, label in enumerate(stats.labels)}
+        if stats.n_features:
+            stats.terms = {column: term for column, term in state["terms"]}
+        else:
+            stats.terms = state["terms"]
+            stats.term_ids = {term: i for i, term in enumerate(stats.terms)}
+        stats.counts = sp.load_npz(os.path.join(path, "counts.npz")).tocsr()
+        stats.n_lines = state["n_lines"]
+        stats.files = state["files"]
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally updated term statistics per topic.")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="folder holding the *_annotated_dialogue.csv files and topic_stats (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    update = subparsers.add_parser("update", help="count the annotated lines added since the last update")
+    update.add_argument("--rebuild", action="store_true", help="start over from every line")
+    update.add_argument("--by", default="annotation", help="grouping column of a new store (default: %(default)s)")
+    update.add_argument("--hash-features", type=int, metavar="N",
+                        help="new store: hash terms into N columns instead of keeping a vocabulary")
+    top = subparsers.add_parser("top", help="print the top TF-IDF words per group")
+    top.add_argument("-k", type=int, default=10, help="words per group (default: 10)")
+    top.add_argument("--max-features", type=int, default=TFIDF_PARAMS["max_features"],
+                     help="only rank the N most frequent terms, 0 for all (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    path = os.path.join(args.data_dir, STATS_DIR)
+    if args.action == "update":
+        if args.rebuild or not os.path.exists(os.path.join(path, "state.json")):
+            stats = TopicStats(args.by, args.hash_features)
+        else:
+            stats = TopicStats.load(path)
+        paths = annotated_files(args.data_dir)
+        if not paths:
+            print("No CSV files found!")
+            return
+        added = stats.update_from_files(paths)
+        stats.save(path)
+        for name, rows in added.items():
+            print(f"  {name}: {rows} new lines")
+        print(f"{sum(added.values())} lines added, {stats.n_lines} counted in {path}")
+        return
+
+    stats = TopicStats.load(path)
+    top_words = stats.top_words(args.k, args.max_features or None)
+    print_top_words(top_words, "Topic" if stats.by == "annotation" else stats.by.capitalize())
+
+
+if __name__ == "__main__":
+    main()